@@ -0,0 +1,24 @@
+"""Load integration modules without importing Home Assistant.
+
+The package ``__init__`` pulls in Home Assistant; the client, parser and
+calculation modules do not need it, so they are loaded under a bare
+package namespace instead.
+"""
+from __future__ import annotations
+
+import importlib
+from pathlib import Path
+import sys
+import types
+
+COMPONENT_DIR = Path(__file__).resolve().parent.parent / "custom_components" / "qinhua_gas"
+PACKAGE = "qinhua_gas"
+
+
+def load(name: str) -> types.ModuleType:
+    """Import ``qinhua_gas.<name>`` from the component directory."""
+    if PACKAGE not in sys.modules:
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [str(COMPONENT_DIR)]
+        sys.modules[PACKAGE] = package
+    return importlib.import_module(f"{PACKAGE}.{name}")
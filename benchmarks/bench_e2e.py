@@ -0,0 +1,202 @@
+"""End-to-end benchmark: fleet refreshes against the local fake API.
+
+Cards are refreshed through the integration's own coordinators, the way
+the fleet drives them in Home Assistant: concurrency semaphore and token
+bucket, streamed fetch with the since filter, InvoiceStore merge, sorted
+index and incremental estimator update, projection. The first round
+fetches every card's full history; each later round the fake API adds
+--new invoices per card and only those are kept and merged.
+
+Reports throughput, p50/p99 refresh latency, p50 compute time per round
+kind and peak traced memory. The fake server runs in the same process
+unless --url is given, so its allocations are part of the memory figure.
+Home Assistant must be installed; no instance is started beyond the
+in-memory core the coordinators need.
+
+Usage: python benchmarks/bench_e2e.py [--cards 1 10 100 1000] [--rows 100] [...]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+from pathlib import Path
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from fake_api import FakeInvoiceApi
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+from custom_components.qinhua_gas import http_client  # noqa: E402
+from custom_components.qinhua_gas.coordinator import (  # noqa: E402
+    XianGasCardCoordinator,
+    XianGasFleetCoordinator,
+)
+from custom_components.qinhua_gas.metrics import (  # noqa: E402
+    STAGE_COMPUTE,
+    RollingHistogram,
+)
+
+
+async def run(
+    api: FakeInvoiceApi | None, url: str, cards: int, rows: int, args: argparse.Namespace
+) -> list[dict[str, float]]:
+    """Refresh cards for every round and return the figures per round kind."""
+    http_client.API_ENDPOINT = url
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        fleet = XianGasFleetCoordinator(
+            hass, args.concurrency, args.rate_limit, args.rate_burst
+        )
+        session = http_client.create_session(limit_per_host=args.concurrency)
+        coordinators = [
+            XianGasCardCoordinator(
+                hass,
+                fleet,
+                f"bench-{card}",
+                http_client.XianGasClient(
+                    "bench", f"{rows}-{card}", 0, "token", session=session
+                ),
+            )
+            for card in range(cards)
+        ]
+
+        tracemalloc.start()
+        results = []
+        for round_number in range(args.rounds):
+            if round_number and api is not None:
+                api.advance(args.new)
+                for card in coordinators:
+                    api.body(card.client.card_id)
+            results.append(await refresh_round(coordinators, round_number))
+        _size, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        await session.close()
+        await hass.async_stop(force=True)
+
+    summary = []
+    for kind, rounds in (
+        ("full", results[:1]),
+        ("incr", results[1:]),
+    ):
+        if not rounds:
+            continue
+        latency = RollingHistogram(cards * len(rounds))
+        compute = RollingHistogram(cards * len(rounds))
+        for result in rounds:
+            latency.samples.extend(result["latency"].samples)
+            compute.samples.extend(result["compute"].samples)
+        count = len(latency.samples)
+        summary.append(
+            {
+                "kind": kind,
+                "ok": count,
+                "failed": sum(result["failed"] for result in rounds),
+                "merged": sum(result["merged"] for result in rounds),
+                "throughput": count / sum(result["wall"] for result in rounds),
+                "p50": latency.percentile(0.5) or 0.0,
+                "p99": latency.percentile(0.99) or 0.0,
+                "compute": compute.percentile(0.5) or 0.0,
+                "peak": peak,
+            }
+        )
+    return summary
+
+
+async def refresh_round(
+    coordinators: list[XianGasCardCoordinator], round_number: int
+) -> dict[str, float]:
+    """Refresh every card once, as XianGasFleetCoordinator.async_refresh_cards does."""
+    latency = RollingHistogram(len(coordinators))
+    compute = RollingHistogram(len(coordinators))
+    failed = 0
+    before = sum(len(card.invoices.history) for card in coordinators)
+
+    async def refresh(card: XianGasCardCoordinator) -> None:
+        nonlocal failed
+        start = time.perf_counter()
+        if not await card.async_refresh_shared():
+            failed += 1
+            return
+        latency.add(time.perf_counter() - start)
+        compute.add(card.client.metrics.stages[STAGE_COMPUTE].last)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(refresh(card) for card in coordinators))
+    wall = time.perf_counter() - start
+    after = sum(len(card.invoices.history) for card in coordinators)
+    return {
+        "round": round_number,
+        "failed": failed,
+        "merged": after - before,
+        "wall": wall,
+        "latency": latency,
+        "compute": compute,
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    """Run the benchmark for each fleet size."""
+    runner = None
+    api = None
+    url = args.url
+    if url is None:
+        api = FakeInvoiceApi(
+            args.rows,
+            args.latency,
+            args.jitter,
+            args.error_rate,
+            args.malformed_rate,
+            args.string_body,
+        )
+        runner, url = await api.async_start()
+
+    print(
+        f"rows={args.rows} new={args.new} concurrency={args.concurrency} "
+        f"rounds={args.rounds} latency={args.latency}s error_rate={args.error_rate}"
+    )
+    print(
+        f"{'cards':>6}{'round':>6}{'ok':>7}{'failed':>8}{'merged':>8}{'refresh/s':>11}"
+        f"{'p50 ms':>9}{'p99 ms':>9}{'calc ms':>9}{'peak MiB':>10}"
+    )
+    for cards in args.cards:
+        if api is not None:
+            # 每个规模都从完整历史开始，响应体预先生成，不计入内存峰值
+            api.newer = 0
+            api.advance(0)
+            for card in range(cards):
+                api.body(f"{args.rows}-{card}")
+        for result in await run(api, url, cards, args.rows, args):
+            print(
+                f"{cards:>6}{result['kind']:>6}{result['ok']:>7}{result['failed']:>8}"
+                f"{result['merged']:>8}{result['throughput']:>11.1f}"
+                f"{result['p50'] * 1e3:>9.2f}{result['p99'] * 1e3:>9.2f}"
+                f"{result['compute'] * 1e3:>9.3f}{result['peak'] / 2**20:>10.2f}"
+            )
+    if runner is not None:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--new", type=int, default=1, help="new invoices per card per round")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate-limit", type=float, default=1000.0)
+    parser.add_argument("--rate-burst", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--string-body", action="store_true")
+    parser.add_argument("--url", help="benchmark an already running fake_api.py")
+    # 注入的错误日期会逐条告警，基准输出里不需要
+    logging.getLogger("custom_components.qinhua_gas").setLevel(logging.ERROR)
+    asyncio.run(main(parser.parse_args()))
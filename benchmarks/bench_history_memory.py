@@ -0,0 +1,43 @@
+"""Measure per-card memory of the invoice history representations.
+
+Usage: python benchmarks/bench_history_memory.py [rows ...]
+"""
+from __future__ import annotations
+
+import gc
+import sys
+import tracemalloc
+
+from _component import load
+from bench_parser import make_response
+
+history_module = load("history")
+parser = load("parser")
+
+
+def measure(build) -> int:
+    """Return the bytes still allocated by the object build() returns."""
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    size, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj
+    return size
+
+
+def main(sizes: list[int]) -> None:
+    """Compare list-of-dicts against InvoiceHistory for each length."""
+    print(f"{'rows':>8}{'list[dict]':>14}{'InvoiceHistory':>16}{'ratio':>8}")
+    for rows in sizes:
+        response = make_response(rows)
+        records = parser.parse_invoices(response)
+        dicts = measure(lambda: [
+            {"date": item["dt"], "cost": float(item["fee"])} for item in response["data"]
+        ])
+        columns = measure(lambda: history_module.InvoiceHistory.from_records(records))
+        print(f"{rows:>8}{dicts / rows:>12.1f} B{columns / rows:>14.1f} B{dicts / columns:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000])
@@ -0,0 +1,103 @@
+"""Micro-benchmark: invoice parsing and summary, legacy path vs parser.
+
+Usage: python benchmarks/bench_parser.py [rows ...]
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+import random
+import sys
+import timeit
+
+from _component import load
+
+parser = load("parser")
+
+
+def make_response(rows: int, seed: int = 0) -> dict:
+    """Build a synthetic searchInvoice response, newest first."""
+    rng = random.Random(seed)
+    day = date(2024, 1, 1)
+    items = []
+    for i in range(rows):
+        dt = day.isoformat()
+        if i % 3 == 0:
+            dt += f" {rng.randrange(24):02d}:{rng.randrange(60):02d}:00"
+        fee = round(rng.uniform(50, 300), 2)
+        items.append({"dt": dt, "fee": str(fee) if i % 2 else fee})
+        day -= timedelta(days=rng.randrange(1, 4))
+    return {"data": items}
+
+
+def legacy_clean(response: dict) -> list[dict]:
+    """The former _clean_invoice_data: strptime up to twice per record."""
+
+    def is_valid(date_str):
+        try:
+            datetime.strptime(date_str, "%Y-%m-%d")
+            return True
+        except ValueError:
+            try:
+                datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
+                return True
+            except ValueError:
+                return False
+
+    cleaned = []
+    for item in response["data"]:
+        date_value = item.get("dt", "")
+        if not date_value or not is_valid(date_value):
+            continue
+        try:
+            cost = float(item.get("fee", 0))
+        except (ValueError, TypeError):
+            cost = 0
+        cleaned.append({"date": date_value, "cost": cost})
+    return cleaned
+
+
+def legacy_summary(data: list[dict]) -> float:
+    """The former _calculate_gas_usage: re-parses first and last dates."""
+
+    def parse(date_str):
+        try:
+            return datetime.strptime(date_str, "%Y-%m-%d")
+        except ValueError:
+            return datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
+
+    days = abs((parse(data[-1]["date"]) - parse(data[0]["date"])).days) or 1
+    return sum(float(item["cost"]) for item in data[1:]) / days
+
+
+def parser_summary(records: list) -> float:
+    """Summary over parsed records, reusing their timestamps."""
+    days = abs((records[-1].ts - records[0].ts) // parser.SECONDS_PER_DAY) or 1
+    return sum(record.cost for record in records[1:]) / days
+
+
+def bench(label: str, func, rows: int) -> float:
+    """Return the best per-record cost in microseconds."""
+    number = max(1, 100_000 // rows)
+    best = min(timeit.repeat(func, number=number, repeat=5))
+    per_record = best / number / rows * 1e6
+    print(f"  {label:<28}{per_record:8.3f} µs/record")
+    return per_record
+
+
+def main(sizes: list[int]) -> None:
+    """Run the benchmark for each history length."""
+    for rows in sizes:
+        response = make_response(rows)
+        legacy = legacy_clean(response)
+        records = parser.parse_invoices(response)
+        assert len(legacy) == len(records) == rows
+        assert abs(legacy_summary(legacy) - parser_summary(records)) < 1e-9
+
+        print(f"{rows} rows")
+        old = bench("legacy clean + summary", lambda: legacy_summary(legacy_clean(response)), rows)
+        new = bench("parse_invoices + summary", lambda: parser_summary(parser.parse_invoices(response)), rows)
+        print(f"  speed-up {old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 50_000, 100_000])
@@ -0,0 +1,145 @@
+"""Local stand-in for the /rs/WX/searchInvoice endpoint.
+
+Every card gets a deterministic synthetic history. Latency, error
+responses, malformed dates and string-encoded JSON bodies can be injected
+to exercise the client without touching wkf.qhgas.com.
+
+Usage: python benchmarks/fake_api.py [--port 8080] [--rows 100] [...]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+from datetime import date, timedelta
+from zlib import crc32
+
+from aiohttp import web
+
+from bench_parser import make_response
+
+PATH = "/rs/WX/searchInvoice"
+
+MALFORMED_DATES = ("2024/01/05", "05-01-2024", "not a date", "2024-13-01", "")
+
+
+class FakeInvoiceApi:
+    """Configurable fake of the invoice endpoint."""
+
+    def __init__(
+        self,
+        rows: int = 100,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        malformed_rate: float = 0.0,
+        string_body: bool = False,
+        seed: int = 0,
+    ) -> None:
+        """Initialize the fake.
+
+        latency and jitter are seconds, error_rate is the share of requests
+        answered with 503 and malformed_rate the share of records whose
+        date is broken.
+        """
+        self.rows = rows
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.string_body = string_body
+        self.seed = seed
+        self.newer = 0
+        self.requests = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._bodies: dict[str, bytes] = {}
+
+    def advance(self, count: int) -> None:
+        """Give every card count more invoices, dated after the existing ones."""
+        self.newer += count
+        self._bodies.clear()
+
+    def body(self, card_id: str) -> bytes:
+        """Return the encoded response for one card, built once."""
+        if (body := self._bodies.get(card_id)) is None:
+            card_seed = crc32(card_id.encode()) ^ self.seed
+            response = make_response(self.rows, card_seed)
+            # make_response 的最新记录是 2024-01-01，新增的记录排在它前面
+            response["data"][:0] = [
+                {
+                    "dt": (date(2024, 1, 1) + timedelta(days=day)).isoformat(),
+                    "fee": 100.0,
+                }
+                for day in range(self.newer, 0, -1)
+            ]
+            rng = random.Random(card_seed)
+            for item in response["data"]:
+                if rng.random() < self.malformed_rate:
+                    item["dt"] = rng.choice(MALFORMED_DATES)
+            text = json.dumps(response, ensure_ascii=False)
+            if self.string_body:
+                # 接口偶尔把整个 JSON 再编码成字符串返回
+                text = json.dumps(text, ensure_ascii=False)
+            body = self._bodies[card_id] = text.encode()
+        return body
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """Answer one searchInvoice request."""
+        self.requests += 1
+        payload = await request.json()
+        card_id = str(payload.get("data", {}).get("cardId", ""))
+        delay = self.latency + self._rng.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        if self._rng.random() < self.error_rate:
+            self.errors += 1
+            return web.Response(status=503, text="Service Unavailable")
+        return web.Response(
+            body=self.body(card_id), content_type="application/json", charset="utf-8"
+        )
+
+    def make_app(self) -> web.Application:
+        """Return an aiohttp application serving the endpoint."""
+        app = web.Application()
+        app.router.add_post(PATH, self.handle)
+        return app
+
+    async def async_start(
+        self, host: str = "127.0.0.1", port: int = 0
+    ) -> tuple[web.AppRunner, str]:
+        """Start serving and return the runner and the endpoint URL."""
+        runner = web.AppRunner(self.make_app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        bound_port = runner.addresses[0][1]
+        return runner, f"http://{host}:{bound_port}{PATH}"
+
+
+def main() -> None:
+    """Serve the fake endpoint until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--string-body", action="store_true")
+    args = parser.parse_args()
+    api = FakeInvoiceApi(
+        args.rows,
+        args.latency,
+        args.jitter,
+        args.error_rate,
+        args.malformed_rate,
+        args.string_body,
+    )
+    web.run_app(api.make_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Time-travel simulator: estimator accuracy and CPU cost, day by day.
+
+A synthetic household burns gas every day (more in the heating season)
+and recharges once the balance gets low. Each simulated day the client is
+asked for a projection with its clock set to that day, once by rebuilding
+the estimator from the whole history (index + summary) and once by feeding
+only the new recharges to a long-lived estimator. Both must agree; the
+report shows their CPU cost per evaluation and how far the projection is
+from the simulated truth.
+
+With --history a recorded searchInvoice response is replayed instead. The
+true balance is unknown then, so only the run-out error is reported, using
+the next recharge as the true run-out day.
+
+Usage: python benchmarks/sim_estimators.py [--years 5] [--amounts 100,200,300,500] [...]
+"""
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+import json
+import logging
+import random
+import time as perf
+
+from _component import load
+
+const = load("const")
+estimator_module = load("estimator")
+history_module = load("history")
+http_client = load("http_client")
+parser = load("parser")
+
+
+@dataclass
+class World:
+    """Recharges per day and, for synthetic runs, the true balance."""
+
+    start: date
+    days: int
+    recharges: dict[int, list[dict]] = field(default_factory=dict)
+    balance: list[float] | None = None
+    usage: list[float] | None = None
+
+    def true_days_left(self, offset: int) -> int | None:
+        """Return the days until the balance runs out without recharging."""
+        if self.balance is None:
+            # 录制数据：下一次充值的日子就是真实的用完日
+            for later in range(offset + 1, self.days):
+                if later in self.recharges:
+                    return later - offset
+            return None
+        balance = self.balance[offset]
+        for later in range(offset, self.days):
+            balance -= self.usage[later]
+            if balance < 0:
+                return later - offset
+        return None
+
+
+def synthetic_world(years: int, amounts: list[float], seed: int) -> World:
+    """Simulate daily usage and recharges that keep the balance positive."""
+    rng = random.Random(seed)
+    start = date(2015, 1, 1)
+    days = years * 365
+    world = World(start, days, balance=[], usage=[])
+    balance = amounts[-1]
+    world.recharges[0] = [{"dt": start.isoformat(), "fee": balance}]
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        heating = estimator_module.is_heating_day(day.toordinal())
+        usage = (8.0 if heating else 2.0) * rng.lognormvariate(0, 0.3)
+        world.balance.append(balance)
+        world.usage.append(usage)
+        balance -= usage
+        if balance < const.BALANCE_OFFSET:
+            fee = rng.choice(amounts)
+            balance += fee
+            # 当天用完后充值，第二天起按新余额计算
+            world.recharges.setdefault(offset + 1, []).append(
+                {"dt": (day + timedelta(days=1)).isoformat(), "fee": fee}
+            )
+    return world
+
+
+def recorded_world(path: str) -> World:
+    """Replay the recharges of a recorded response."""
+    with open(path, encoding="utf-8") as file:
+        records = parser.parse_invoices(json.load(file))
+    records.sort(key=lambda record: record.ts)
+    start = date.fromordinal(records[0].ts // parser.SECONDS_PER_DAY)
+    end = date.fromordinal(records[-1].ts // parser.SECONDS_PER_DAY)
+    world = World(start, (end - start).days + 1)
+    for record in records:
+        offset = record.ts // parser.SECONDS_PER_DAY - start.toordinal()
+        world.recharges.setdefault(offset, []).append(
+            {"dt": record.date, "fee": record.cost}
+        )
+    return world
+
+
+@dataclass
+class Report:
+    """Accumulated errors and CPU time of one estimator."""
+
+    evaluations: int = 0
+    balance_error: float = 0.0
+    balance_bias: float = 0.0
+    days_error: float = 0.0
+    days_samples: int = 0
+    rebuild_ns: int = 0
+    incremental_ns: int = 0
+
+
+def simulate(world: World, key: str) -> Report:
+    """Replay the world day by day for one estimator."""
+    report = Report()
+    current = [datetime.combine(world.start, time(12))]
+    client = http_client.XianGasClient(
+        "sim", "sim", 0, "sim", estimator=key, clock=lambda: current[0]
+    )
+    history = history_module.InvoiceHistory()
+    incremental = None
+    for offset in range(world.days):
+        current[0] = datetime.combine(world.start + timedelta(days=offset), time(12))
+        added = None
+        if rows := world.recharges.get(offset):
+            added = client._clean_invoice_data(rows)
+            history.prepend(added)
+        if len(history) < 2:
+            continue
+
+        # 从头重建：排序索引 + 汇总 + 推算
+        started = perf.process_time_ns()
+        estimator = client._summarize_gas_usage(
+            history_module.HistoryIndex.from_history(history)
+        )
+        rebuilt = client._project_gas_usage(estimator)
+        report.rebuild_ns += perf.process_time_ns() - started
+
+        # 增量：只把新充值喂给常驻的估算器
+        started = perf.process_time_ns()
+        if incremental is None:
+            incremental = client._summarize_gas_usage(
+                history_module.HistoryIndex.from_history(history)
+            )
+        elif added and not incremental.update(
+            history_module.HistoryIndex.from_history(added).items()
+        ):
+            incremental = client._summarize_gas_usage(
+                history_module.HistoryIndex.from_history(history)
+            )
+        projected = client._project_gas_usage(incremental)
+        report.incremental_ns += perf.process_time_ns() - started
+
+        if projected != rebuilt:
+            raise AssertionError(f"{key} day {offset}: {projected} != {rebuilt}")
+        report.evaluations += 1
+        if world.balance is not None:
+            error = projected["balance"] - world.balance[offset]
+            report.balance_error += abs(error)
+            report.balance_bias += error
+        truth = world.true_days_left(offset)
+        if truth is not None:
+            report.days_error += abs(projected["usage_days"] - truth)
+            report.days_samples += 1
+    return report
+
+
+def main(args: argparse.Namespace) -> None:
+    """Run every estimator over the same world and print the comparison."""
+    if args.history:
+        world = recorded_world(args.history)
+    else:
+        amounts = [float(amount) for amount in args.amounts.split(",")]
+        world = synthetic_world(args.years, amounts, args.seed)
+    recharges = sum(len(rows) for rows in world.recharges.values())
+    print(f"{world.days} days, {recharges} recharges")
+    print(
+        f"{'estimator':<10}{'evals':>7}{'bal MAE':>9}{'bal bias':>10}{'days MAE':>10}"
+        f"{'rebuild µs':>12}{'incr µs':>9}{'speed-up':>10}"
+    )
+    for key in args.estimators:
+        report = simulate(world, key)
+        evals = report.evaluations or 1
+        balance_mae = report.balance_error / evals if world.balance else float("nan")
+        balance_bias = report.balance_bias / evals if world.balance else float("nan")
+        days_mae = report.days_error / (report.days_samples or 1)
+        rebuild = report.rebuild_ns / evals / 1e3
+        incremental = report.incremental_ns / evals / 1e3
+        print(
+            f"{key:<10}{report.evaluations:>7}{balance_mae:>9.2f}{balance_bias:>10.2f}"
+            f"{days_mae:>10.2f}{rebuild:>12.1f}{incremental:>9.1f}"
+            f"{rebuild / incremental:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    argument_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argument_parser.add_argument("--years", type=int, default=5)
+    argument_parser.add_argument("--amounts", default="100,200,300,500")
+    argument_parser.add_argument("--seed", type=int, default=0)
+    argument_parser.add_argument("--history", help="recorded searchInvoice response (JSON)")
+    argument_parser.add_argument(
+        "--estimators", nargs="+", default=list(estimator_module.ESTIMATORS)
+    )
+    logging.getLogger("qinhua_gas").setLevel(logging.ERROR)
+    main(argument_parser.parse_args())
@@ -4,14 +4,17 @@ from __future__ import annotations
 import logging
 from datetime import timedelta
 
+import voluptuous as vol
+
+from homeassistant import config_entries
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+import homeassistant.helpers.config_validation as cv
+from homeassistant.util import dt as dt_util
 
 from .const import (
     DOMAIN,
-    SCAN_INTERVAL,
     CONF_USER_ID,
     CONF_CARD_ID,
     CONF_XIUZHENG,
@@ -20,17 +23,86 @@ from .const import (
     DEFAULT_CARD_ID,
     DEFAULT_XIUZHENG,
     DEFAULT_TOKEN_S,
+    CONF_LIMIT_PER_HOST,
+    CONF_KEEPALIVE_TIMEOUT,
+    CONF_DNS_CACHE_TTL,
+    DEFAULT_LIMIT_PER_HOST,
+    DEFAULT_KEEPALIVE_TIMEOUT,
+    DEFAULT_DNS_CACHE_TTL,
+    CONF_MAX_CONCURRENCY,
+    CONF_RATE_LIMIT,
+    CONF_RATE_BURST,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_RATE_LIMIT,
+    DEFAULT_RATE_BURST,
+    CONF_WARM_START,
+    DEFAULT_WARM_START,
+    CONF_WINDOWS,
+    DEFAULT_WINDOWS,
+    CONF_ESTIMATOR,
+    DEFAULT_ESTIMATOR,
+    CONF_ALERT_DAYS,
+    CONF_ALERT_BALANCE,
+    DEFAULT_ALERT_DAYS,
+    DEFAULT_ALERT_BALANCE,
+    CONF_PROJECTION_INTERVAL,
+    CONF_SCAN_INTERVAL,
+    SCAN_INTERVAL,
+    DATA_CONFIG,
+    DATA_SEED,
 )
+from .alerts import ThresholdTimers
+from .coordinator import XianGasCardCoordinator, async_get_fleet, parse_windows
 from .http_client import XianGasClient
+from .services import async_setup_services
+from .session import async_acquire_session, async_release_session
+from .store import InvoiceStore
 
 _LOGGER = logging.getLogger(__name__)
 
-PLATFORMS = [Platform.SENSOR]
+PLATFORMS = [Platform.SENSOR, Platform.BINARY_SENSOR]
+
+CONFIG_SCHEMA = vol.Schema(
+    {
+        vol.Optional(DOMAIN): vol.Schema(
+            {
+                vol.Optional(
+                    CONF_LIMIT_PER_HOST, default=DEFAULT_LIMIT_PER_HOST
+                ): cv.positive_int,
+                vol.Optional(
+                    CONF_KEEPALIVE_TIMEOUT, default=DEFAULT_KEEPALIVE_TIMEOUT
+                ): cv.positive_int,
+                vol.Optional(
+                    CONF_DNS_CACHE_TTL, default=DEFAULT_DNS_CACHE_TTL
+                ): cv.positive_int,
+                vol.Optional(
+                    CONF_MAX_CONCURRENCY, default=DEFAULT_MAX_CONCURRENCY
+                ): cv.positive_int,
+                vol.Optional(
+                    CONF_RATE_LIMIT, default=DEFAULT_RATE_LIMIT
+                ): vol.All(vol.Coerce(float), vol.Range(min=0.01)),
+                vol.Optional(
+                    CONF_RATE_BURST, default=DEFAULT_RATE_BURST
+                ): cv.positive_int,
+                vol.Optional(CONF_WARM_START, default=DEFAULT_WARM_START): cv.boolean,
+                vol.Optional(
+                    CONF_SCAN_INTERVAL, default=SCAN_INTERVAL
+                ): cv.positive_time_period,
+                vol.Optional(CONF_PROJECTION_INTERVAL): cv.positive_time_period,
+            }
+        )
+    },
+    extra=vol.ALLOW_EXTRA,
+)
 
 
 async def async_setup(hass: HomeAssistant, config: dict) -> bool:
     """Set up the 西安天然气 component."""
     hass.data.setdefault(DOMAIN, {})
+    hass.data[DATA_CONFIG] = config.get(DOMAIN, {})
+    # 在任何配置项之外创建车队协调器，避免它绑定到第一个配置项上
+    async_get_fleet(hass)
+    async_setup_services(hass)
     
     # If no config entry exists, create one with default values
     if not hass.config_entries.async_entries(DOMAIN):
@@ -57,26 +129,53 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     card_id = entry.options.get(CONF_CARD_ID, entry.data.get(CONF_CARD_ID, DEFAULT_CARD_ID))
     xiuzheng = entry.options.get(CONF_XIUZHENG, entry.data.get(CONF_XIUZHENG, DEFAULT_XIUZHENG))
     token_s = entry.options.get(CONF_TOKEN_S, entry.data.get(CONF_TOKEN_S, DEFAULT_TOKEN_S))
+    windows = entry.options.get(CONF_WINDOWS, DEFAULT_WINDOWS)
+    estimator = entry.options.get(CONF_ESTIMATOR, DEFAULT_ESTIMATOR)
+    alert_days = entry.options.get(CONF_ALERT_DAYS, DEFAULT_ALERT_DAYS)
+    alert_balance = entry.options.get(CONF_ALERT_BALANCE, DEFAULT_ALERT_BALANCE)
     
     _LOGGER.info("设置修正值: %s", xiuzheng)
     
+    session = await async_acquire_session(hass, entry.entry_id)
     client = XianGasClient(
         user_id,
         card_id,
         xiuzheng,
         token_s,
+        session=session,
+        estimator=estimator,
+        # 按 Home Assistant 的时区取“今天”，与零点定时器和提醒时间一致
+        clock=dt_util.now,
     )
 
-    coordinator = DataUpdateCoordinator(
-        hass,
-        _LOGGER,
-        name=DOMAIN,
-        update_method=client.async_get_data,
-        update_interval=SCAN_INTERVAL,
+    # 所有卡片共用一个车队协调器统一调度，每张卡只保留自己的数据视图
+    fleet = async_get_fleet(hass)
+    coordinator = XianGasCardCoordinator(hass, fleet, entry.entry_id, client)
+    try:
+        coordinator.windows = parse_windows(windows)
+    except ValueError:
+        _LOGGER.warning("无效的统计窗口配置: %s，使用默认值", windows)
+    coordinator.alerts = ThresholdTimers(hass, card_id, alert_days, alert_balance)
+    entry.async_on_unload(coordinator.alerts.async_cancel)
+    await coordinator.invoices.async_load()
+
+    coordinator.warm_start = hass.data.get(DATA_CONFIG, {}).get(
+        CONF_WARM_START, DEFAULT_WARM_START
     )
-
-    # Fetch initial data
-    await coordinator.async_config_entry_first_refresh()
+    seed = hass.data.get(DATA_SEED, {}).pop(coordinator.credentials, None)
+    if seed is not None:
+        # 新建的配置项直接使用配置流程校验时取得的数据，不再重复请求
+        coordinator.async_seed(seed)
+    elif coordinator.warm_start and coordinator.async_restore():
+        # 先用缓存数据启动，实时刷新由车队协调器随机错开后在后台进行
+        coordinator.next_poll = dt_util.utcnow() + fleet.scheduler.startup_delay()
+    else:
+        # Fetch initial data
+        try:
+            await coordinator.async_config_entry_first_refresh()
+        except Exception:
+            await async_release_session(hass, entry.entry_id)
+            raise
 
     # Store coordinator and client for platforms to access
     hass.data.setdefault(DOMAIN, {})
@@ -85,6 +184,8 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # Set up all platforms for this device/entry
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
+    entry.async_on_unload(fleet.async_add_card(coordinator))
+
     # Add update listener for config entry changes
     entry.async_on_unload(entry.add_update_listener(async_reload_entry))
 
@@ -99,14 +200,51 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # Clean up
     if unload_ok:
         coordinator = hass.data[DOMAIN][entry.entry_id]
-        client = coordinator.update_method.__self__
-        await client.async_close()
+        # 重新加载后热启动要读到最新的记录
+        await coordinator.invoices.async_flush()
+        await coordinator.client.async_close()
         hass.data[DOMAIN].pop(entry.entry_id)
+        await async_release_session(hass, entry.entry_id)
 
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the stored invoice history of a deleted entry."""
+    card_id = entry.options.get(CONF_CARD_ID, entry.data.get(CONF_CARD_ID, DEFAULT_CARD_ID))
+    await InvoiceStore(hass, card_id).async_remove()
+
+
 async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
-    """Reload the config entry when it changed."""
-    _LOGGER.info("重新加载配置项，修正值: %s", entry.options.get(CONF_XIUZHENG))
-    await hass.config_entries.async_reload(entry.entry_id)
+    """Apply changed options, reloading only when the credentials changed."""
+    coordinator = hass.data[DOMAIN].get(entry.entry_id)
+    credentials = tuple(
+        entry.options.get(key, entry.data.get(key, default))
+        for key, default in (
+            (CONF_USER_ID, DEFAULT_USER_ID),
+            (CONF_CARD_ID, DEFAULT_CARD_ID),
+            (CONF_TOKEN_S, DEFAULT_TOKEN_S),
+        )
+    )
+    if coordinator is None or coordinator.credentials != credentials:
+        _LOGGER.info("账号信息已变更，重新加载配置项")
+        await hass.config_entries.async_reload(entry.entry_id)
+        return
+
+    # 只影响推算的选项直接在内存中重算，不重新请求接口
+    xiuzheng = entry.options.get(CONF_XIUZHENG, entry.data.get(CONF_XIUZHENG, DEFAULT_XIUZHENG))
+    windows = entry.options.get(CONF_WINDOWS, DEFAULT_WINDOWS)
+    try:
+        parsed_windows = parse_windows(windows)
+    except ValueError:
+        _LOGGER.warning("无效的统计窗口配置: %s，保持原值", windows)
+        parsed_windows = coordinator.windows
+    _LOGGER.info("更新配置选项，修正值: %s", xiuzheng)
+    # 窗口变化时传感器平台就地增删窗口传感器，会话和轮询计划保持不变
+    coordinator.async_reconfigure(
+        xiuzheng,
+        entry.options.get(CONF_ESTIMATOR, DEFAULT_ESTIMATOR),
+        parsed_windows,
+        entry.options.get(CONF_ALERT_DAYS, DEFAULT_ALERT_DAYS),
+        entry.options.get(CONF_ALERT_BALANCE, DEFAULT_ALERT_BALANCE),
+    )
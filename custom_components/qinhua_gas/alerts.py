@@ -0,0 +1,173 @@
+"""Low-balance and run-out threshold timers for 西安天然气."""
+from __future__ import annotations
+
+from datetime import date, datetime
+from functools import partial
+import logging
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_point_in_utc_time
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    ATTR_BALANCE,
+    ATTR_PRICE,
+    ATTR_USAGE_DAYS,
+    DEFAULT_ALERT_BALANCE,
+    DEFAULT_ALERT_DAYS,
+    EVENT_THRESHOLD,
+)
+from .estimator import MAX_PROJECTION_DAYS, ConsumptionEstimator
+
+_LOGGER = logging.getLogger(__name__)
+
+THRESHOLD_DAYS = "days"
+THRESHOLD_BALANCE = "balance"
+
+
+class ThresholdTimers:
+    """Fire events and flip binary sensors when a card crosses a threshold.
+
+    The projection gives a deterministic crossing day per threshold, so each
+    threshold gets one timer at local midnight of that day. A timer is only
+    rescheduled when a new projection moves its crossing.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        card_id: str,
+        days: int = DEFAULT_ALERT_DAYS,
+        balance: float = DEFAULT_ALERT_BALANCE,
+    ) -> None:
+        """Initialize the timers."""
+        self.hass = hass
+        self.card_id = card_id
+        self.thresholds: dict[str, float] = {
+            THRESHOLD_DAYS: days,
+            THRESHOLD_BALANCE: balance,
+        }
+        self.crossings: dict[str, datetime | None] = dict.fromkeys(self.thresholds)
+        # None 表示尚未判断过，首次判断不触发事件
+        self.active: dict[str, bool | None] = dict.fromkeys(self.thresholds)
+        self._unsub: dict[str, CALLBACK_TYPE] = {}
+        self._listeners: list[CALLBACK_TYPE] = []
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        """Listen for threshold state changes."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def _async_remove_listener() -> None:
+            self._listeners.remove(update_callback)
+
+        return _async_remove_listener
+
+    @callback
+    def async_update(
+        self,
+        gas_usage: dict[str, Any] | None,
+        estimator: ConsumptionEstimator | None,
+        today: date,
+    ) -> None:
+        """Recompute the crossings after a new projection made for today."""
+        today_ordinal = today.toordinal()
+        changed = False
+        for key in self.thresholds:
+            day = self._crossing_day(key, gas_usage, estimator, today_ordinal)
+            crossing = None
+            if day is not None:
+                try:
+                    crossing = dt_util.as_utc(
+                        dt_util.start_of_local_day(date.fromordinal(day))
+                    )
+                except (ValueError, OverflowError):
+                    _LOGGER.debug("卡号 %s 阈值 %s 越过日期超出范围", self.card_id, key)
+            if crossing == self.crossings[key] and self.active[key] is not None:
+                continue
+            self.crossings[key] = crossing
+            self._async_schedule(key)
+            changed = True
+        if changed:
+            self._async_notify()
+
+    @callback
+    def async_cancel(self) -> None:
+        """Cancel all pending timers."""
+        for unsub in self._unsub.values():
+            unsub()
+        self._unsub.clear()
+
+    def _crossing_day(
+        self,
+        key: str,
+        gas_usage: dict[str, Any] | None,
+        estimator: ConsumptionEstimator | None,
+        today: int,
+    ) -> int | None:
+        """Return the ordinal on which a threshold is crossed, if ever."""
+        if not gas_usage:
+            return None
+        threshold = self.thresholds[key]
+        if key == THRESHOLD_DAYS:
+            # 没有消耗时剩余天数为 0，并不表示即将用完
+            if gas_usage[ATTR_PRICE] <= 0:
+                return None
+            return today + int(gas_usage[ATTR_USAGE_DAYS] - threshold)
+        left = gas_usage[ATTR_BALANCE] - threshold
+        if left <= 0:
+            return today
+        if estimator is None:
+            return None
+        days = estimator.days_until_empty(left, today)
+        # 没有消耗时永远不会低于阈值；推算范围之外也视为不会越过
+        if days <= 0 or days > MAX_PROJECTION_DAYS:
+            return None
+        return today + int(days)
+
+    @callback
+    def _async_schedule(self, key: str) -> None:
+        """Arm the timer of one threshold for its current crossing."""
+        if (unsub := self._unsub.pop(key, None)) is not None:
+            unsub()
+        crossing = self.crossings[key]
+        if crossing is None:
+            self._set_active(key, False)
+        elif crossing <= dt_util.utcnow():
+            self._set_active(key, True)
+        else:
+            self._set_active(key, False)
+            self._unsub[key] = async_track_point_in_utc_time(
+                self.hass, partial(self._async_cross, key), crossing
+            )
+
+    @callback
+    def _async_cross(self, key: str, now: datetime) -> None:
+        """Handle a threshold timer firing."""
+        self._unsub.pop(key, None)
+        self._set_active(key, True)
+        self._async_notify()
+
+    def _set_active(self, key: str, active: bool) -> None:
+        """Update one threshold state, firing an event when it is crossed."""
+        previous = self.active[key]
+        self.active[key] = active
+        if active and previous is False:
+            _LOGGER.info("卡号 %s 达到提醒阈值 %s", self.card_id, key)
+            self.hass.bus.async_fire(
+                EVENT_THRESHOLD,
+                {
+                    "card_id": self.card_id,
+                    "threshold": key,
+                    "value": self.thresholds[key],
+                    "crossing": self.crossings[key].isoformat(),
+                },
+            )
+
+    @callback
+    def _async_notify(self) -> None:
+        """Notify the listeners."""
+        for update_callback in list(self._listeners):
+            update_callback()
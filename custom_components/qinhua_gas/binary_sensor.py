@@ -0,0 +1,104 @@
+"""Binary sensor platform for 西安天然气 integration."""
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+from homeassistant.components.binary_sensor import (
+    BinarySensorDeviceClass,
+    BinarySensorEntity,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .alerts import THRESHOLD_BALANCE, THRESHOLD_DAYS
+from .const import DOMAIN, NAME
+
+_LOGGER = logging.getLogger(__name__)
+
+THRESHOLD_NAMES = {
+    THRESHOLD_DAYS: ("即将用完", "mdi:calendar-alert"),
+    THRESHOLD_BALANCE: ("余额不足", "mdi:cash-remove"),
+}
+
+
+async def async_setup_entry(
+    hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
+) -> None:
+    """Set up 西安天然气 binary sensors based on a config entry."""
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+
+    async_add_entities(
+        XianGasThresholdSensor(coordinator, entry, key) for key in THRESHOLD_NAMES
+    )
+
+
+class XianGasThresholdSensor(CoordinatorEntity, BinarySensorEntity):
+    """On once the projection says a card has crossed one threshold."""
+
+    def __init__(self, coordinator, config_entry: ConfigEntry, key: str) -> None:
+        """Initialize the binary sensor."""
+        super().__init__(coordinator)
+        name, icon = THRESHOLD_NAMES[key]
+        self._config_entry = config_entry
+        self._key = key
+        self._attr_name = f"{NAME} {name}"
+        self._attr_unique_id = f"{config_entry.entry_id}_alert_{key}"
+        self._attr_icon = icon
+        self._attr_device_class = BinarySensorDeviceClass.PROBLEM
+        self._attr_has_entity_name = True
+        self._cache_key: tuple[Any, ...] | None = None
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        """Return device information."""
+        return DeviceInfo(
+            identifiers={(DOMAIN, self._config_entry.entry_id)},
+            name=NAME
+        )
+
+    @property
+    def available(self) -> bool:
+        """Return if entity is available."""
+        if not self.coordinator.data:
+            return False
+        if self.coordinator.warm_start:
+            return True
+        return super().available
+
+    async def async_added_to_hass(self) -> None:
+        """Subscribe to threshold changes as well as coordinator updates."""
+        self._update_cache()
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self.coordinator.alerts.async_add_listener(self._handle_coordinator_update)
+        )
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write state only when the threshold state or availability changed."""
+        if self._update_cache():
+            self.async_write_ha_state()
+
+    def _update_cache(self) -> bool:
+        """Refresh the cached state from the threshold timers."""
+        alerts = self.coordinator.alerts
+        crossing = alerts.crossings[self._key]
+        cache_key = (
+            alerts.active[self._key],
+            crossing,
+            alerts.thresholds[self._key],
+            self.available,
+        )
+        if cache_key == self._cache_key:
+            return False
+        self._cache_key = cache_key
+        self._attr_is_on = alerts.active[self._key]
+        self._attr_extra_state_attributes = {
+            "阈值": alerts.thresholds[self._key],
+            "预计触发时间": crossing.isoformat() if crossing else None,
+        }
+        return True
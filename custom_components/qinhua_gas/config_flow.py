@@ -14,12 +14,24 @@ from .const import (
     CONF_CARD_ID,
     CONF_XIUZHENG,
     CONF_TOKEN_S,
+    CONF_WINDOWS,
+    CONF_ESTIMATOR,
+    CONF_ALERT_DAYS,
+    CONF_ALERT_BALANCE,
     DEFAULT_USER_ID,
     DEFAULT_CARD_ID,
     DEFAULT_XIUZHENG,
     DEFAULT_TOKEN_S,
+    DEFAULT_WINDOWS,
+    DEFAULT_ESTIMATOR,
+    DEFAULT_ALERT_DAYS,
+    DEFAULT_ALERT_BALANCE,
+    DATA_SEED,
 )
+from .coordinator import parse_windows
+from .estimator import ESTIMATORS
 from .http_client import XianGasClient
+from .session import async_acquire_session, async_release_session
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -37,18 +49,27 @@ class XianGasConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         errors = {}
 
         if user_input is not None:
+            session = await async_acquire_session(self.hass, self.flow_id)
             client = XianGasClient(
                 user_input[CONF_USER_ID],
                 user_input[CONF_CARD_ID],
                 user_input[CONF_XIUZHENG],
                 user_input[CONF_TOKEN_S],
+                session=session,
             )
 
             try:
-                result = await client.async_get_data()
-                await client.async_close()
-                
-                if result:
+                # 只校验响应外层结构，清洗和推算留给配置项首次刷新
+                response = await client.async_validate()
+
+                if response is not None:
+                    self.hass.data.setdefault(DATA_SEED, {})[
+                        (
+                            user_input[CONF_USER_ID],
+                            user_input[CONF_CARD_ID],
+                            user_input[CONF_TOKEN_S],
+                        )
+                    ] = response
                     return self.async_create_entry(
                         title=f"{NAME} - {user_input[CONF_CARD_ID]}",
                         data=user_input,
@@ -57,6 +78,9 @@ class XianGasConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             except Exception:  # pylint: disable=broad-except
                 _LOGGER.exception("Unexpected exception")
                 errors["base"] = "unknown"
+            finally:
+                await client.async_close()
+                await async_release_session(self.hass, self.flow_id)
 
         return self.async_show_form(
             step_id="user",
@@ -87,6 +111,8 @@ class XianGasOptionsFlowHandler(config_entries.OptionsFlow):
 
     async def async_step_init(self, user_input=None):
         """Manage the options."""
+        errors = {}
+
         if user_input is not None:
             # 确保修正值是浮点数
             if CONF_XIUZHENG in user_input:
@@ -95,8 +121,14 @@ class XianGasOptionsFlowHandler(config_entries.OptionsFlow):
                 except (ValueError, TypeError):
                     user_input[CONF_XIUZHENG] = DEFAULT_XIUZHENG
             
-            _LOGGER.info("更新配置选项，修正值: %s", user_input.get(CONF_XIUZHENG))
-            return self.async_create_entry(title="", data=user_input)
+            try:
+                parse_windows(user_input.get(CONF_WINDOWS, DEFAULT_WINDOWS))
+            except ValueError:
+                errors[CONF_WINDOWS] = "invalid_windows"
+
+            if not errors:
+                _LOGGER.info("更新配置选项，修正值: %s", user_input.get(CONF_XIUZHENG))
+                return self.async_create_entry(title="", data=user_input)
 
         # 优先从 options 中获取值，如果没有则从 data 中获取
         user_id = self.config_entry.options.get(
@@ -115,6 +147,12 @@ class XianGasOptionsFlowHandler(config_entries.OptionsFlow):
             CONF_TOKEN_S, 
             self.config_entry.data.get(CONF_TOKEN_S, DEFAULT_TOKEN_S)
         )
+        windows = self.config_entry.options.get(CONF_WINDOWS, DEFAULT_WINDOWS)
+        estimator = self.config_entry.options.get(CONF_ESTIMATOR, DEFAULT_ESTIMATOR)
+        alert_days = self.config_entry.options.get(CONF_ALERT_DAYS, DEFAULT_ALERT_DAYS)
+        alert_balance = self.config_entry.options.get(
+            CONF_ALERT_BALANCE, DEFAULT_ALERT_BALANCE
+        )
         
         _LOGGER.info("显示配置表单，当前修正值: %s", xiuzheng)
         
@@ -126,6 +164,17 @@ class XianGasOptionsFlowHandler(config_entries.OptionsFlow):
                     vol.Required(CONF_CARD_ID, default=card_id): str,
                     vol.Required(CONF_XIUZHENG, default=xiuzheng): vol.Coerce(float),
                     vol.Required(CONF_TOKEN_S, default=token_s): str,
+                    vol.Optional(CONF_WINDOWS, default=windows): str,
+                    vol.Optional(CONF_ESTIMATOR, default=estimator): vol.In(
+                        list(ESTIMATORS)
+                    ),
+                    vol.Optional(CONF_ALERT_DAYS, default=alert_days): vol.All(
+                        vol.Coerce(int), vol.Range(min=0)
+                    ),
+                    vol.Optional(
+                        CONF_ALERT_BALANCE, default=alert_balance
+                    ): vol.Coerce(float),
                 }
             ),
+            errors=errors,
         )
@@ -20,5 +20,96 @@ ATTR_BALANCE = "balance"
 ATTR_USAGE_DAYS = "usage_days"
 ATTR_DATA = "data"
 
+# 属性中只保留最近几次充值，完整历史导入长期统计
+RECENT_RECHARGES = 10
+
+# 滚动窗口日均消费
+CONF_WINDOWS = "windows"
+DEFAULT_WINDOWS = "30,90,365"
+
+# 西安供暖季：11月15日至次年3月15日
+HEATING_SEASON_START = (11, 15)
+HEATING_SEASON_END = (3, 15)
+
+# 日均消费估算策略
+CONF_ESTIMATOR = "estimator"
+ESTIMATOR_MEAN = "mean"
+ESTIMATOR_EWMA = "ewma"
+ESTIMATOR_SEASONAL = "seasonal"
+DEFAULT_ESTIMATOR = ESTIMATOR_MEAN
+EWMA_ALPHA = 0.3
+
+# 推算余额时额外加上的基础余额（元）
+BALANCE_OFFSET = 10
+
+# 低余额 / 即将用完提醒阈值
+CONF_ALERT_DAYS = "alert_days"
+CONF_ALERT_BALANCE = "alert_balance"
+DEFAULT_ALERT_DAYS = 7
+DEFAULT_ALERT_BALANCE = 20.0
+EVENT_THRESHOLD = f"{DOMAIN}_threshold"
+
+# 共享连接池配置
+CONF_LIMIT_PER_HOST = "limit_per_host"
+CONF_KEEPALIVE_TIMEOUT = "keepalive_timeout"
+CONF_DNS_CACHE_TTL = "dns_cache_ttl"
+
+DEFAULT_LIMIT_PER_HOST = 4
+DEFAULT_KEEPALIVE_TIMEOUT = 30  # seconds
+DEFAULT_DNS_CACHE_TTL = 300  # seconds
+
+# 请求超时、重试与熔断
+CONNECT_TIMEOUT = 5  # seconds
+READ_TIMEOUT = 15  # seconds
+MAX_RETRIES = 2
+RETRY_BACKOFF = 0.5  # seconds, doubled per retry
+BREAKER_FAILURES = 5
+BREAKER_RESET = 60  # seconds
+
+# 响应体分块流式解析，超过阈值后在线程池中解析
+STREAM_CHUNK_SIZE = 64 * 1024  # bytes
+STREAM_EXECUTOR_THRESHOLD = 256 * 1024  # bytes
+
+# 每张卡保留最近多少次刷新的耗时与大小统计
+METRICS_WINDOW = 100
+
+# 批量抓取（车队模式）配置
+CONF_MAX_CONCURRENCY = "max_concurrency"
+CONF_RATE_LIMIT = "rate_limit"
+CONF_RATE_BURST = "rate_burst"
+
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_RATE_LIMIT = 2.0  # requests per second
+DEFAULT_RATE_BURST = 4
+
+# 启动时先使用缓存数据，再在后台刷新
+CONF_WARM_START = "warm_start"
+DEFAULT_WARM_START = True
+
+# 本地重新推算余额（不发网络请求）；未配置间隔时每天零点推算一次
+CONF_PROJECTION_INTERVAL = "projection_interval"
+CONF_SCAN_INTERVAL = "scan_interval"
+
+# 本地存储
+STORAGE_VERSION = 1
+STORAGE_KEY_INVOICES = f"{DOMAIN}.invoices"
+STORAGE_SAVE_DELAY = 10  # seconds
+
+DATA_CONFIG = f"{DOMAIN}_config"
+DATA_SESSION = f"{DOMAIN}_session"
+DATA_FLEET = f"{DOMAIN}_fleet"
+# 配置流程校验时取得的响应，交给新配置项作为首次刷新的数据
+DATA_SEED = f"{DOMAIN}_seed"
+
 from datetime import timedelta
 SCAN_INTERVAL = timedelta(seconds=86400)  # 24 hours
+
+# 自适应轮询
+MIN_POLL_INTERVAL = timedelta(hours=2)
+MAX_POLL_INTERVAL = timedelta(days=7)
+RETRY_INTERVAL = timedelta(minutes=5)
+STARTUP_JITTER = timedelta(minutes=10)
+MIN_POLL_TICK = timedelta(seconds=30)
+POLL_JITTER = 0.1
+MAX_BACKOFF_STEPS = 3
+NEAR_RUNOUT_DAYS = 3
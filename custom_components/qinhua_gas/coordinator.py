@@ -0,0 +1,477 @@
+"""Coordinators for 西安天然气."""
+from __future__ import annotations
+
+import asyncio
+from datetime import date, datetime, timedelta
+import logging
+import time
+from typing import Any, Callable
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import (
+    async_track_time_change,
+    async_track_time_interval,
+)
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    CONF_MAX_CONCURRENCY,
+    CONF_PROJECTION_INTERVAL,
+    CONF_RATE_BURST,
+    CONF_RATE_LIMIT,
+    CONF_SCAN_INTERVAL,
+    DATA_CONFIG,
+    DATA_FLEET,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_RATE_BURST,
+    DEFAULT_RATE_LIMIT,
+    DEFAULT_WINDOWS,
+    DOMAIN,
+    MIN_POLL_TICK,
+    RECENT_RECHARGES,
+    SCAN_INTERVAL,
+)
+from .alerts import THRESHOLD_BALANCE, THRESHOLD_DAYS, ThresholdTimers
+from .history import HistoryIndex, InvoiceHistory, heating_season
+from .http_client import XianGasClient
+from .metrics import STAGE_COMPUTE
+from .scheduler import PollScheduler
+from .statistics import async_import_spend_statistics
+from .store import InvoiceStore
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token-bucket rate limiter shared by all fetches."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        """Initialize the bucket with rate tokens per second."""
+        self._rate = rate
+        self._capacity = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def async_acquire(self) -> None:
+        """Wait until a token is available and take it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self._capacity, self._tokens + (now - self._updated) * self._rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+class XianGasCardCoordinator(DataUpdateCoordinator):
+    """Per-card coordinator whose fetches are driven by the fleet."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        fleet: XianGasFleetCoordinator,
+        entry_id: str,
+        client: XianGasClient,
+    ) -> None:
+        """Initialize the card coordinator."""
+        super().__init__(hass, _LOGGER, name=f"{DOMAIN}_{client.card_id}")
+        self.fleet = fleet
+        self.entry_id = entry_id
+        self.client = client
+        self.invoices = InvoiceStore(hass, client.card_id)
+        self.warm_start = False
+        self.windows = parse_windows(DEFAULT_WINDOWS)
+        self.alerts = ThresholdTimers(hass, client.card_id)
+        # 自适应轮询状态，由车队协调器按 next_poll 调度
+        self.next_poll: datetime = dt_util.utcnow()
+        self.failures = 0
+        self.stable_polls = 0
+        self._refresh_task: asyncio.Task[None] | None = None
+        self._window_listeners: list[CALLBACK_TYPE] = []
+
+    @property
+    def credentials(self) -> tuple[str, str, str]:
+        """Return the (userId, cardId, tokenS) tuple of this card."""
+        return (self.client.user_id, self.client.card_id, self.client.token_s)
+
+    async def _async_update_data(self) -> dict[str, Any]:
+        """Fetch this card through the fleet's limits and merge new invoices."""
+        scheduler = self.fleet.scheduler
+        try:
+            response = await self.fleet.async_fetch(
+                self.client, self.invoices.last_ts
+            )
+            return self._process_response(response)
+        except Exception as err:
+            # 处理响应出错时也要推迟下次轮询，否则每个调度周期都会重新请求
+            self.failures += 1
+            self.next_poll = dt_util.utcnow() + scheduler.delay_after_failure(
+                self.failures
+            )
+            raise UpdateFailed(f"卡号 {self.client.card_id} 更新失败: {err}") from err
+
+    @callback
+    def async_seed(self, response: Any) -> None:
+        """Use a response fetched elsewhere (the config flow) as the first refresh."""
+        self.async_set_updated_data(self._process_response(response))
+
+    def _process_response(self, response: Any) -> dict[str, Any]:
+        """Merge a successful response and plan the next poll."""
+        scheduler = self.fleet.scheduler
+        invoices = self.invoices
+        start = time.perf_counter()
+        # 没有新记录时跳过清洗和汇总，只按今天的日期重新推算余额
+        added = invoices.sync(self.client, response)
+        if added is not None or invoices.index is None:
+            self._summarize(added)
+            self.stable_polls = 0
+        else:
+            _LOGGER.debug("卡号 %s 没有新充值记录", self.client.card_id)
+            self.stable_polls += 1
+        invoices.mark_success()
+        data = self._build_data()
+        self.client.metrics.record(STAGE_COMPUTE, time.perf_counter() - start)
+
+        self.failures = 0
+        usage_days = data["ranqi"]["usage_days"] if data["ranqi"] else None
+        self.next_poll = dt_util.utcnow() + scheduler.delay_after_success(
+            usage_days, self.stable_polls
+        )
+        return data
+
+    @property
+    def refresh_in_flight(self) -> bool:
+        """Return True while a shared refresh is running."""
+        return self._refresh_task is not None
+
+    async def async_refresh_shared(self) -> bool:
+        """Refresh now, joining the refresh already in flight if there is one.
+
+        Returns whether the refresh succeeded.
+        """
+        if self._refresh_task is None:
+            self._refresh_task = self.hass.async_create_task(
+                self._async_refresh(log_failures=True),
+                f"{DOMAIN}_{self.client.card_id}_refresh",
+            )
+            self._refresh_task.add_done_callback(self._async_refresh_done)
+        # 调用方被取消时不取消共享的刷新
+        await asyncio.shield(self._refresh_task)
+        return self.last_update_success
+
+    async def async_refresh(self) -> None:
+        """Refresh through the shared refresh.
+
+        Entity updates (homeassistant.update_entity) reach this through the
+        request-refresh debouncer, so they join a refresh already in flight
+        too.
+        """
+        await self.async_refresh_shared()
+
+    @callback
+    def _async_refresh_done(self, task: asyncio.Task[None]) -> None:
+        """Forget the finished shared refresh."""
+        self._refresh_task = None
+
+    @callback
+    def async_restore(self) -> bool:
+        """Serve the stored history until the first live refresh finishes."""
+        invoices = self.invoices
+        if not invoices.history or invoices.last_success is None:
+            return False
+        self._summarize()
+        self.data = self._build_data()
+        _LOGGER.debug(
+            "卡号 %s 使用 %s 的缓存数据启动", self.client.card_id, invoices.last_success
+        )
+        return True
+
+    @callback
+    def async_recompute(self) -> None:
+        """Re-run the projection from the held history without fetching."""
+        if self.data is None:
+            return
+        self.data = self._build_data()
+        self.async_update_listeners()
+
+    @callback
+    def async_reconfigure(
+        self,
+        xiuzheng: float,
+        estimator: str,
+        windows: tuple[int, ...],
+        alert_days: int,
+        alert_balance: float,
+    ) -> bool:
+        """Apply projection-only options in place, without fetching.
+
+        Returns True if the window set changed; the window listeners are
+        then called so the sensor platform can add and remove entities.
+        """
+        client = self.client
+        client.xiuzheng = xiuzheng
+        if estimator != client.estimator:
+            client.estimator = estimator
+            if self.invoices.index is not None:
+                self.invoices.estimator = client._summarize_gas_usage(
+                    self.invoices.index
+                )
+        self.alerts.thresholds[THRESHOLD_DAYS] = alert_days
+        self.alerts.thresholds[THRESHOLD_BALANCE] = alert_balance
+        windows_changed = windows != self.windows
+        self.windows = windows
+        self.async_recompute()
+        if windows_changed:
+            for update_callback in list(self._window_listeners):
+                update_callback()
+        return windows_changed
+
+    @callback
+    def async_add_windows_listener(
+        self, update_callback: CALLBACK_TYPE
+    ) -> CALLBACK_TYPE:
+        """Listen for changes of the window set."""
+        self._window_listeners.append(update_callback)
+
+        @callback
+        def _async_remove_listener() -> None:
+            self._window_listeners.remove(update_callback)
+
+        return _async_remove_listener
+
+    def _summarize(self, added: InvoiceHistory | None = None) -> None:
+        """Rebuild the sorted index and update the estimator after a change.
+
+        New invoices are fed to the existing estimator; it is only rebuilt
+        from the whole index when that is not possible.
+        """
+        invoices = self.invoices
+        invoices.index = HistoryIndex.from_history(invoices.history)
+        self.hass.async_create_background_task(
+            async_import_spend_statistics(self.hass, self.client.card_id, invoices.index),
+            f"{DOMAIN}_{self.client.card_id}_statistics",
+        )
+        if (
+            invoices.estimator is not None
+            and added
+            and invoices.estimator.update(HistoryIndex.from_history(added).items())
+        ):
+            return
+        invoices.estimator = self.client._summarize_gas_usage(invoices.index)
+
+    def _build_data(self) -> dict[str, Any]:
+        """Build the sensor payload from the stored history."""
+        invoices = self.invoices
+        today = self.client.clock().date()
+        gas_usage = None
+        if invoices.estimator is not None:
+            gas_usage = self.client._project_gas_usage(invoices.estimator)
+        # 只有预测的越过时间变化时才重新安排提醒定时器
+        self.alerts.async_update(gas_usage, invoices.estimator, today)
+        history = invoices.history
+        index = invoices.index
+        # 上游顺序不可靠，最近充值取自按时间排序的索引
+        recent = index.recent(RECENT_RECHARGES) if index else []
+        total = round(index.prefix[-1], 2) if index else 0.0
+        count = len(index) if index else 0
+        windows = self._window_costs(today)
+        runout = None
+        if gas_usage:
+            try:
+                runout = today + timedelta(days=gas_usage["usage_days"])
+            except OverflowError:
+                runout = None
+        last_recharge = None
+        if index:
+            last_recharge = {
+                "date": date.fromordinal(index.days[-1]),
+                "cost": index.costs[-1],
+            }
+        # 传感器按版本缓存派生值；版本不变时不写状态
+        version = hash(
+            (
+                tuple(gas_usage.items()) if gas_usage else None,
+                tuple((record["date"], record["cost"]) for record in recent),
+                total,
+                count,
+                tuple(windows.items()),
+                runout,
+                tuple(last_recharge.items()) if last_recharge else None,
+            )
+        )
+        return {
+            "ranqi": gas_usage,
+            "ranqidata": history,
+            "recent": recent,
+            "total": total,
+            "count": count,
+            "windows": windows,
+            "runout": runout,
+            "last_recharge": last_recharge,
+            "updated": invoices.last_success,
+            "version": version,
+        }
+
+    def _window_costs(self, today: date) -> dict[int | str, float]:
+        """Return the rolling daily cost per window, all from one index."""
+        index = self.invoices.index
+        if not index:
+            return {}
+        last_day = today.toordinal()
+        costs: dict[int | str, float] = {
+            days: round(index.daily_cost(last_day - days + 1, last_day), 2)
+            for days in self.windows
+        }
+        costs["heating"] = round(index.daily_cost(*heating_season(today)), 2)
+        return costs
+
+
+class XianGasFleetCoordinator(DataUpdateCoordinator):
+    """Refresh every card on one schedule with bounded concurrency."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        rate_limit: float = DEFAULT_RATE_LIMIT,
+        rate_burst: int = DEFAULT_RATE_BURST,
+        scan_interval: timedelta = SCAN_INTERVAL,
+        projection_interval: timedelta | None = None,
+    ) -> None:
+        """Initialize the fleet coordinator."""
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=f"{DOMAIN}_fleet",
+            update_interval=scan_interval,
+        )
+        self.cards: dict[str, XianGasCardCoordinator] = {}
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._bucket = TokenBucket(rate_limit, rate_burst)
+        self.scheduler = PollScheduler(scan_interval)
+        self._projection_interval = projection_interval
+        self._unsub_projection: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_add_card(self, card: XianGasCardCoordinator) -> Callable[[], None]:
+        """Register a card and return a callback that removes it again."""
+        self.cards[card.entry_id] = card
+        # 有卡片时保持调度运行，最后一张卡移除后自动停止
+        remove_listener = self.async_add_listener(lambda: None)
+        if self._unsub_projection is None:
+            self._async_start_projection()
+        # 新卡可能比当前计划的唤醒时间更早到期
+        self._async_reschedule()
+        self._schedule_refresh()
+
+        @callback
+        def _async_remove_card() -> None:
+            remove_listener()
+            self.cards.pop(card.entry_id, None)
+            if not self.cards and self._unsub_projection is not None:
+                self._unsub_projection()
+                self._unsub_projection = None
+
+        return _async_remove_card
+
+    @callback
+    def _async_start_projection(self) -> None:
+        """Schedule the local projection ticker."""
+        if self._projection_interval is None:
+            self._unsub_projection = async_track_time_change(
+                self.hass, self._async_project, hour=0, minute=0, second=0
+            )
+        else:
+            self._unsub_projection = async_track_time_interval(
+                self.hass, self._async_project, self._projection_interval
+            )
+
+    @callback
+    def _async_project(self, now: datetime) -> None:
+        """Recompute every card's balance locally, with no HTTP request."""
+        for card in self.cards.values():
+            card.async_recompute()
+
+    async def async_fetch(
+        self, client: XianGasClient, since: int | None = None
+    ) -> Any:
+        """Fetch one card once a concurrency slot is free, one token per attempt."""
+        async with self._semaphore:
+            # 重试也要取令牌，上游大面积出错时请求速率仍受限
+            return await client.async_fetch_invoices(since, self._bucket.async_acquire)
+
+    async def _async_update_data(self) -> dict[str, bool]:
+        """Refresh the cards that are due; a failing card does not affect the others."""
+        now = dt_util.utcnow()
+        cards = [card for card in self.cards.values() if card.next_poll <= now]
+        await self.async_refresh_cards(cards)
+        return {card.entry_id: card.last_update_success for card in cards}
+
+    async def async_refresh_cards(
+        self, cards: list[XianGasCardCoordinator]
+    ) -> dict[str, dict[str, Any]]:
+        """Refresh cards now and return the outcome and timing per card.
+
+        Cards that are already refreshing are joined rather than fetched
+        again, so overlapping callers cause one request per card.
+        """
+
+        async def _async_refresh_card(
+            card: XianGasCardCoordinator,
+        ) -> tuple[str, dict[str, Any]]:
+            coalesced = card.refresh_in_flight
+            start = time.monotonic()
+            success = await card.async_refresh_shared()
+            return card.client.card_id, {
+                "success": success,
+                "coalesced": coalesced,
+                "duration": round(time.monotonic() - start, 3),
+                "error": None if success else str(card.last_exception),
+            }
+
+        results = dict(
+            await asyncio.gather(*(_async_refresh_card(card) for card in cards))
+        )
+        failed = [card_id for card_id, result in results.items() if not result["success"]]
+        if failed:
+            _LOGGER.warning("%s/%s 张卡更新失败: %s", len(failed), len(cards), failed)
+        self._async_reschedule()
+        return results
+
+    @callback
+    def _async_reschedule(self) -> None:
+        """Wake up next when the earliest card is due."""
+        if not self.cards:
+            return
+        earliest = min(card.next_poll for card in self.cards.values())
+        self.update_interval = max(MIN_POLL_TICK, earliest - dt_util.utcnow())
+
+
+def parse_windows(value: str) -> tuple[int, ...]:
+    """Parse a comma separated list of window lengths in days."""
+    windows = {int(part) for part in str(value).split(",") if part.strip()}
+    if not windows or min(windows) <= 0:
+        raise ValueError(f"invalid windows: {value}")
+    return tuple(sorted(windows))
+
+
+@callback
+def async_get_fleet(hass: HomeAssistant) -> XianGasFleetCoordinator:
+    """Return the integration-wide fleet coordinator, creating it if needed."""
+    if (fleet := hass.data.get(DATA_FLEET)) is None:
+        conf = hass.data.get(DATA_CONFIG, {})
+        fleet = hass.data[DATA_FLEET] = XianGasFleetCoordinator(
+            hass,
+            max_concurrency=conf.get(CONF_MAX_CONCURRENCY, DEFAULT_MAX_CONCURRENCY),
+            rate_limit=conf.get(CONF_RATE_LIMIT, DEFAULT_RATE_LIMIT),
+            rate_burst=conf.get(CONF_RATE_BURST, DEFAULT_RATE_BURST),
+            scan_interval=conf.get(CONF_SCAN_INTERVAL, SCAN_INTERVAL),
+            projection_interval=conf.get(CONF_PROJECTION_INTERVAL),
+        )
+    return fleet
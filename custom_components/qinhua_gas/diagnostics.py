@@ -0,0 +1,44 @@
+"""Diagnostics support for 西安天然气."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import API_ENDPOINT, CONF_TOKEN_S, CONF_USER_ID, DOMAIN
+from .transport import get_breaker
+
+TO_REDACT = {CONF_USER_ID, CONF_TOKEN_S}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    invoices = coordinator.invoices
+    breaker = get_breaker(API_ENDPOINT)
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": async_redact_data(dict(entry.options), TO_REDACT),
+        },
+        "card": {
+            "last_update_success": coordinator.last_update_success,
+            "last_success": invoices.last_success,
+            "next_poll": coordinator.next_poll,
+            "failures": coordinator.failures,
+            "stable_polls": coordinator.stable_polls,
+            "records": len(invoices.history),
+            "history_bytes": invoices.history.memory_size(),
+            "estimator": coordinator.client.estimator,
+            "projection": (coordinator.data or {}).get("ranqi"),
+        },
+        "upstream": {
+            "circuit": breaker.state,
+            "consecutive_failures": breaker.failures,
+        },
+        "metrics": coordinator.client.metrics.as_dict(),
+    }
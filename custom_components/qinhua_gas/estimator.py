@@ -0,0 +1,211 @@
+"""Consumption estimators for 西安天然气."""
+from __future__ import annotations
+
+from datetime import date
+from typing import Iterable
+
+from .const import (
+    ESTIMATOR_EWMA,
+    ESTIMATOR_MEAN,
+    ESTIMATOR_SEASONAL,
+    EWMA_ALPHA,
+    HEATING_SEASON_END,
+    HEATING_SEASON_START,
+)
+from .parser import SECONDS_PER_DAY
+
+# 预测可用天数时最多向后推算的天数
+MAX_PROJECTION_DAYS = 3650
+
+
+def is_heating_day(day: int) -> bool:
+    """Return True if the ordinal falls in the heating season."""
+    moment = date.fromordinal(day)
+    month_day = (moment.month, moment.day)
+    return month_day >= HEATING_SEASON_START or month_day <= HEATING_SEASON_END
+
+
+class ConsumptionEstimator:
+    """Base class: estimate the daily spend from the recharge history.
+
+    Records are fed oldest first with add(). State is updated in place,
+    so new invoices only cost their own update. A record older than the
+    newest one seen cannot be merged; add() returns False and the caller
+    rebuilds from the full history. update() also refuses records at the
+    time of the newest one seen, since a rebuild orders records of the
+    same time by cost.
+    """
+
+    key = ""
+
+    def __init__(self) -> None:
+        """Initialize an empty estimator."""
+        self.count = 0
+        self.latest_ts: int | None = None
+        self.latest_cost = 0.0
+
+    def add(self, ts: int, cost: float) -> bool:
+        """Feed one record; return False if it is out of order."""
+        if self.latest_ts is not None and ts < self.latest_ts:
+            return False
+        if self.latest_ts is not None:
+            self._add_interval(self.latest_ts, self.latest_cost, ts)
+        self.count += 1
+        self.latest_ts = ts
+        self.latest_cost = cost
+        return True
+
+    def update(self, records: Iterable[tuple[int, float]]) -> bool:
+        """Feed ascending (ts, cost) records; return False on the first gap."""
+        latest_ts = self.latest_ts
+        for ts, cost in records:
+            # 与已有最新记录同一时间的记录增量合并后顺序可能与重建不同
+            if latest_ts is not None and ts <= latest_ts:
+                return False
+            if not self.add(ts, cost):
+                return False
+        return True
+
+    def _add_interval(self, start_ts: int, cost: float, end_ts: int) -> None:
+        """Account for a recharge of cost used up between two recharges."""
+        raise NotImplementedError
+
+    def daily_cost(self, day: int) -> float:
+        """Return the estimated spend on the given ordinal."""
+        raise NotImplementedError
+
+    def spend_between(self, first_day: int, days: int) -> float:
+        """Return the estimated spend over days starting at first_day."""
+        return self.daily_cost(first_day) * days
+
+    def days_until_empty(self, balance: float, first_day: int) -> float:
+        """Return how many days the balance lasts starting at first_day."""
+        rate = self.daily_cost(first_day)
+        return balance / rate if rate > 0 else 0
+
+
+class MeanEstimator(ConsumptionEstimator):
+    """Whole-span mean: all recharges but the latest over the full span."""
+
+    key = ESTIMATOR_MEAN
+
+    def __init__(self) -> None:
+        """Initialize the estimator."""
+        super().__init__()
+        self.oldest_ts: int | None = None
+        self.total = 0.0
+
+    def add(self, ts: int, cost: float) -> bool:
+        """Feed one record; return False if it is out of order."""
+        if self.oldest_ts is None:
+            self.oldest_ts = ts
+        return super().add(ts, cost)
+
+    def _add_interval(self, start_ts: int, cost: float, end_ts: int) -> None:
+        """Add the previous latest recharge to the total."""
+        self.total += cost
+
+    def daily_cost(self, day: int) -> float:
+        """Return the mean daily spend."""
+        if self.count < 2:
+            return 0.0
+        # 计算天数差，向上取整
+        span = (self.oldest_ts - self.latest_ts) // SECONDS_PER_DAY
+        span = abs(span) if span != 0 else 1  # 确保不为零
+        return self.total / span
+
+
+class EwmaEstimator(ConsumptionEstimator):
+    """Exponentially weighted mean of the per-interval daily spend."""
+
+    key = ESTIMATOR_EWMA
+
+    def __init__(self, alpha: float = EWMA_ALPHA) -> None:
+        """Initialize the estimator."""
+        super().__init__()
+        self.alpha = alpha
+        self.rate: float | None = None
+
+    def _add_interval(self, start_ts: int, cost: float, end_ts: int) -> None:
+        """Blend the daily spend of one interval into the average."""
+        days = max(1, (end_ts - start_ts) // SECONDS_PER_DAY)
+        rate = cost / days
+        self.rate = rate if self.rate is None else (
+            self.alpha * rate + (1 - self.alpha) * self.rate
+        )
+
+    def daily_cost(self, day: int) -> float:
+        """Return the weighted daily spend."""
+        return self.rate or 0.0
+
+
+class SeasonalEstimator(ConsumptionEstimator):
+    """Separate mean daily spend for heating and non-heating days."""
+
+    key = ESTIMATOR_SEASONAL
+
+    def __init__(self) -> None:
+        """Initialize the estimator."""
+        super().__init__()
+        # 下标 0 为非供暖季，1 为供暖季
+        self.costs = [0.0, 0.0]
+        self.days = [0, 0]
+
+    def _add_interval(self, start_ts: int, cost: float, end_ts: int) -> None:
+        """Split one interval's spend over its heating and other days."""
+        first_day = start_ts // SECONDS_PER_DAY
+        days = max(1, end_ts // SECONDS_PER_DAY - first_day)
+        heating = sum(is_heating_day(day) for day in range(first_day, first_day + days))
+        for season, season_days in ((1, heating), (0, days - heating)):
+            self.costs[season] += cost * season_days / days
+            self.days[season] += season_days
+
+    def _rate(self, heating: bool) -> float:
+        """Return the daily spend for one season, or the overall mean."""
+        season = int(heating)
+        if self.days[season]:
+            return self.costs[season] / self.days[season]
+        total_days = self.days[0] + self.days[1]
+        return (self.costs[0] + self.costs[1]) / total_days if total_days else 0.0
+
+    def daily_cost(self, day: int) -> float:
+        """Return the daily spend for the season of the given ordinal."""
+        return self._rate(is_heating_day(day))
+
+    def spend_between(self, first_day: int, days: int) -> float:
+        """Return the estimated spend, day by day across seasons."""
+        heating = self._rate(True)
+        other = self._rate(False)
+        return sum(
+            heating if is_heating_day(day) else other
+            for day in range(first_day, first_day + days)
+        )
+
+    def days_until_empty(self, balance: float, first_day: int) -> float:
+        """Return how many days the balance lasts across seasons."""
+        heating = self._rate(True)
+        other = self._rate(False)
+        if balance <= 0:
+            # 余额已为负时与其他策略一致，按当天的消耗折算成负天数
+            rate = self.daily_cost(first_day)
+            return balance / rate if rate > 0 else 0
+        if heating <= 0 and other <= 0:
+            return 0
+        for offset in range(MAX_PROJECTION_DAYS):
+            rate = heating if is_heating_day(first_day + offset) else other
+            if rate >= balance:
+                return offset + balance / rate
+            balance -= rate
+        return MAX_PROJECTION_DAYS
+
+
+ESTIMATORS: dict[str, type[ConsumptionEstimator]] = {
+    ESTIMATOR_MEAN: MeanEstimator,
+    ESTIMATOR_EWMA: EwmaEstimator,
+    ESTIMATOR_SEASONAL: SeasonalEstimator,
+}
+
+
+def create_estimator(key: str) -> ConsumptionEstimator:
+    """Return a new estimator for key, falling back to the mean."""
+    return ESTIMATORS.get(key, MeanEstimator)()
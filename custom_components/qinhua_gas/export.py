@@ -0,0 +1,200 @@
+"""Headless bulk export of invoice history for many cards.
+
+Runs without Home Assistant: the card list is fetched through one pooled
+session with a concurrency limit, each card's invoices are cleaned with the
+integration's own parser and streamed to a CSV or JSON Lines file. A
+checkpoint file records every finished card together with the output size
+at that point, so an interrupted run resumes where it stopped: the output
+is cut back to the last checkpoint and finished cards are not fetched
+again.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+from dataclasses import dataclass
+import json
+import logging
+import os
+from typing import IO, Any, Iterator
+
+from .const import DEFAULT_MAX_CONCURRENCY
+from .http_client import XianGasClient, create_session
+
+_LOGGER = logging.getLogger(__name__)
+
+FORMAT_CSV = "csv"
+FORMAT_JSONL = "jsonl"
+FIELDS = ("card_id", "date", "cost")
+
+
+@dataclass
+class ExportSummary:
+    """Outcome of one export run."""
+
+    exported: int = 0
+    skipped: int = 0
+    failed: int = 0
+    records: int = 0
+
+
+def read_cards(path: str) -> Iterator[dict[str, str]]:
+    """Yield user_id/card_id/token_s dicts from a CSV or JSON Lines file."""
+    with open(path, encoding="utf-8", newline="") as file:
+        if path.endswith((".jsonl", ".json")):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(file)
+
+
+def read_checkpoint(path: str) -> tuple[set[str], int | None]:
+    """Return the finished card IDs and the output size after the last one."""
+    done: set[str] = set()
+    offset = None
+    if not os.path.exists(path):
+        return done, offset
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # 中断时可能只写了半行
+                break
+            done.add(entry["card_id"])
+            offset = entry["offset"]
+    return done, offset
+
+
+class InvoiceExporter:
+    """Fetch cards concurrently and stream their invoices to one file."""
+
+    def __init__(
+        self,
+        output: str,
+        output_format: str,
+        checkpoint: str,
+        concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    ) -> None:
+        """Initialize the exporter."""
+        self.output = output
+        self.output_format = output_format
+        self.checkpoint = checkpoint
+        self.concurrency = concurrency
+        self.summary = ExportSummary()
+
+    async def async_run(self, cards: Iterator[dict[str, str]]) -> ExportSummary:
+        """Export every card not yet in the checkpoint."""
+        done, offset = read_checkpoint(self.checkpoint)
+        if offset is not None and not os.path.exists(self.output):
+            _LOGGER.warning("输出文件 %s 不存在，忽略检查点重新导出", self.output)
+            done, offset = set(), None
+        out = self._open_output(offset)
+        # 重新开始时检查点也要清空
+        checkpoint = open(
+            self.checkpoint, "w" if offset is None else "a", encoding="utf-8"
+        )
+        writer = csv.writer(out) if self.output_format == FORMAT_CSV else None
+        if writer is not None and out.tell() == 0:
+            writer.writerow(FIELDS)
+
+        session = create_session(limit_per_host=self.concurrency)
+
+        async def _async_worker() -> None:
+            # 所有 worker 共用一个卡片迭代器，卡片列表不会整体读入内存
+            for card in cards:
+                card_id = str(card["card_id"])
+                if card_id in done:
+                    self.summary.skipped += 1
+                    continue
+                await self._async_export_card(card, session, out, writer, checkpoint)
+
+        try:
+            await asyncio.gather(*(_async_worker() for _ in range(self.concurrency)))
+        finally:
+            await session.close()
+            out.close()
+            checkpoint.close()
+        return self.summary
+
+    def _open_output(self, offset: int | None) -> IO[str]:
+        """Open the output for appending, cut back to the last checkpoint."""
+        if offset is None:
+            # 没有检查点时重新开始
+            return open(self.output, "w", encoding="utf-8", newline="")
+        with open(self.output, "ab") as file:
+            file.truncate(offset)
+        return open(self.output, "a", encoding="utf-8", newline="")
+
+    async def _async_export_card(
+        self,
+        card: dict[str, str],
+        session: Any,
+        out: IO[str],
+        writer: Any,
+        checkpoint: IO[str],
+    ) -> None:
+        """Fetch one card and append its records and checkpoint entry."""
+        card_id = str(card["card_id"])
+        client = XianGasClient(
+            card["user_id"], card_id, 0, card["token_s"], session=session
+        )
+        try:
+            response = await client.async_fetch_invoices()
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.error("卡号 %s 导出失败: %s", card_id, err)
+            self.summary.failed += 1
+            return
+        history = client._clean_invoice_data(response)
+
+        # 下面没有 await，一张卡的记录不会与其他卡交错；写完并刷盘后才记入检查点
+        for position, cost in enumerate(history.costs):
+            row = (card_id, history.date_string(position), cost)
+            if writer is not None:
+                writer.writerow(row)
+            else:
+                out.write(json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False))
+                out.write("\n")
+        out.flush()
+        os.fsync(out.fileno())
+        offset = os.fstat(out.fileno()).st_size
+        checkpoint.write(json.dumps({"card_id": card_id, "offset": offset}) + "\n")
+        checkpoint.flush()
+        self.summary.exported += 1
+        self.summary.records += len(history)
+        _LOGGER.info("卡号 %s 导出 %s 条记录", card_id, len(history))
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        description="Export invoice history of many cards."
+    )
+    parser.add_argument(
+        "cards", help="CSV (user_id,card_id,token_s) or JSON Lines card list"
+    )
+    parser.add_argument("output", help="output file")
+    parser.add_argument("--format", choices=(FORMAT_CSV, FORMAT_JSONL))
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY)
+    parser.add_argument("--checkpoint", help="defaults to <output>.checkpoint")
+    args = parser.parse_args(argv)
+
+    output_format = args.format or (
+        FORMAT_JSONL if args.output.endswith((".jsonl", ".json")) else FORMAT_CSV
+    )
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s"
+    )
+    exporter = InvoiceExporter(
+        args.output,
+        output_format,
+        args.checkpoint or f"{args.output}.checkpoint",
+        args.concurrency,
+    )
+    summary = asyncio.run(exporter.async_run(read_cards(args.cards)))
+    print(
+        f"exported {summary.exported} cards ({summary.records} records), "
+        f"skipped {summary.skipped}, failed {summary.failed}"
+    )
@@ -0,0 +1,240 @@
+"""Compact invoice history for 西安天然气."""
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from typing import Any, Iterable, Iterator
+
+from .const import HEATING_SEASON_END, HEATING_SEASON_START
+from .parser import SECONDS_PER_DAY, InvoiceRecord
+
+
+def format_timestamp(ts: int, has_time: bool) -> str:
+    """Return a record timestamp as YYYY-MM-DD[ HH:MM:SS]."""
+    day = date.fromordinal(ts // SECONDS_PER_DAY).isoformat()
+    if not has_time:
+        return day
+    seconds = ts % SECONDS_PER_DAY
+    return f"{day} {seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class InvoiceView:
+    """Read-only view of one record in an InvoiceHistory."""
+
+    __slots__ = ("_history", "_index")
+
+    def __init__(self, history: InvoiceHistory, index: int) -> None:
+        """Initialize the view."""
+        self._history = history
+        self._index = index
+
+    @property
+    def ts(self) -> int:
+        """Return the record timestamp (see InvoiceRecord)."""
+        return self._history.timestamps[self._index]
+
+    @property
+    def ordinal(self) -> int:
+        """Return the record's date ordinal."""
+        return self.ts // SECONDS_PER_DAY
+
+    @property
+    def cost(self) -> float:
+        """Return the invoice amount."""
+        return self._history.costs[self._index]
+
+    @property
+    def date(self) -> str:
+        """Return the invoice date as YYYY-MM-DD[ HH:MM:SS]."""
+        return self._history.date_string(self._index)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the record in the attribute format."""
+        return {"date": self.date, "cost": self.cost}
+
+    def __repr__(self) -> str:
+        """Return a readable representation."""
+        return f"InvoiceView(date={self.date!r}, cost={self.cost!r})"
+
+
+class InvoiceHistory:
+    """Invoice history stored column-wise, newest first.
+
+    Timestamps live in array('q') (whole-day timestamps are ordinal * 86400),
+    fees in array('d'), and a byte per record remembers whether the upstream
+    date carried a time of day. Dict/JSON forms are only built on demand.
+    """
+
+    __slots__ = ("timestamps", "costs", "_has_time", "_dicts")
+
+    def __init__(self) -> None:
+        """Initialize an empty history."""
+        self.timestamps = array("q")
+        self.costs = array("d")
+        self._has_time = array("b")
+        self._dicts: list[dict[str, Any]] | None = None
+
+    @classmethod
+    def from_records(cls, records: Iterable[InvoiceRecord]) -> InvoiceHistory:
+        """Build a history from parsed records, keeping their order."""
+        history = cls()
+        timestamps = history.timestamps
+        costs = history.costs
+        has_time = history._has_time
+        for record in records:
+            timestamps.append(record.ts)
+            costs.append(record.cost)
+            has_time.append(len(record.date) > 10)
+        return history
+
+    def prepend(self, newer: InvoiceHistory) -> None:
+        """Put newer records in front of the existing ones."""
+        self.timestamps = newer.timestamps + self.timestamps
+        self.costs = newer.costs + self.costs
+        self._has_time = newer._has_time + self._has_time
+        self._dicts = None
+
+    def without(self, pairs: set[tuple[int, float]]) -> InvoiceHistory:
+        """Return a copy without the records whose (ts, cost) is in pairs."""
+        history = InvoiceHistory()
+        for index, pair in enumerate(zip(self.timestamps, self.costs)):
+            if pair in pairs:
+                continue
+            history.timestamps.append(pair[0])
+            history.costs.append(pair[1])
+            history._has_time.append(self._has_time[index])
+        return history
+
+    def date_string(self, index: int) -> str:
+        """Return the date string of the record at index."""
+        return format_timestamp(self.timestamps[index], self._has_time[index])
+
+    def as_dicts(self) -> list[dict[str, Any]]:
+        """Return the records as attribute dicts, built once per change."""
+        if self._dicts is None:
+            self._dicts = [
+                {"date": self.date_string(index), "cost": cost}
+                for index, cost in enumerate(self.costs)
+            ]
+        return self._dicts
+
+    def to_rows(self) -> list[dict[str, Any]]:
+        """Return the records in the upstream dt/fee format for storage."""
+        return [
+            {"dt": self.date_string(index), "fee": cost}
+            for index, cost in enumerate(self.costs)
+        ]
+
+    def memory_size(self) -> int:
+        """Return the bytes held by the columns."""
+        return (
+            self.timestamps.buffer_info()[1] * self.timestamps.itemsize
+            + self.costs.buffer_info()[1] * self.costs.itemsize
+            + self._has_time.buffer_info()[1] * self._has_time.itemsize
+        )
+
+    def __repr__(self) -> str:
+        """Return a short representation without dumping every record."""
+        return f"InvoiceHistory(records={len(self.costs)})"
+
+    def __len__(self) -> int:
+        """Return the number of records."""
+        return len(self.costs)
+
+    def __bool__(self) -> bool:
+        """Return True if there are records."""
+        return len(self.costs) > 0
+
+    def __getitem__(self, index: int) -> InvoiceView:
+        """Return a view of the record at index."""
+        if index < 0:
+            index += len(self.costs)
+        if not 0 <= index < len(self.costs):
+            raise IndexError("invoice index out of range")
+        return InvoiceView(self, index)
+
+    def __iter__(self) -> Iterator[InvoiceView]:
+        """Iterate over record views, newest first."""
+        return (InvoiceView(self, index) for index in range(len(self.costs)))
+
+
+class HistoryIndex:
+    """Date-sorted, deduplicated history with cumulative fee sums.
+
+    Built once per history change; any window total is two bisects.
+    """
+
+    __slots__ = ("days", "timestamps", "costs", "prefix")
+
+    def __init__(self, timestamps: array, costs: array) -> None:
+        """Initialize from ascending, deduplicated columns."""
+        self.timestamps = timestamps
+        self.costs = costs
+        self.days = array("q", (ts // SECONDS_PER_DAY for ts in timestamps))
+        self.prefix = array("d", [0.0])
+        total = 0.0
+        for cost in costs:
+            total += cost
+            self.prefix.append(total)
+
+    @classmethod
+    def from_history(cls, history: InvoiceHistory) -> HistoryIndex:
+        """Sort a history by time and drop exact duplicate records."""
+        timestamps = array("q")
+        costs = array("d")
+        previous = None
+        for pair in sorted(zip(history.timestamps, history.costs)):
+            if pair == previous:
+                continue
+            timestamps.append(pair[0])
+            costs.append(pair[1])
+            previous = pair
+        return cls(timestamps, costs)
+
+    def __len__(self) -> int:
+        """Return the number of distinct records."""
+        return len(self.costs)
+
+    def items(self) -> Iterator[tuple[int, float]]:
+        """Iterate over (ts, cost) pairs, oldest first."""
+        return zip(self.timestamps, self.costs)
+
+    def recent(self, count: int) -> list[dict[str, Any]]:
+        """Return the newest count records as attribute dicts, newest first."""
+        return [
+            {
+                # 索引不记录原始写法，零点整的记录按只有日期处理
+                "date": format_timestamp(ts, ts % SECONDS_PER_DAY != 0),
+                "cost": cost,
+            }
+            for ts, cost in zip(
+                reversed(self.timestamps[-count:]), reversed(self.costs[-count:])
+            )
+        ]
+
+    def spend_between(self, first_day: int, last_day: int) -> float:
+        """Return the fees dated between two ordinals, both inclusive."""
+        start = bisect_left(self.days, first_day)
+        end = bisect_right(self.days, last_day)
+        if end <= start:
+            return 0.0
+        return self.prefix[end] - self.prefix[start]
+
+    def daily_cost(self, first_day: int, last_day: int) -> float:
+        """Return the average spend per day over an inclusive ordinal range."""
+        days = last_day - first_day + 1
+        if days <= 0:
+            return 0.0
+        return self.spend_between(first_day, last_day) / days
+
+
+def heating_season(today: date) -> tuple[int, int]:
+    """Return the ordinal range of the current, or last finished, heating season.
+
+    The range ends today while the season is running.
+    """
+    year = today.year if (today.month, today.day) >= HEATING_SEASON_START else today.year - 1
+    start = date(year, *HEATING_SEASON_START)
+    end = date(year + 1, *HEATING_SEASON_END)
+    return start.toordinal(), min(today, end).toordinal()
@@ -1,201 +1,235 @@
 """HTTP client for 西安天然气."""
 import logging
 from datetime import datetime
+from time import perf_counter
 import aiohttp
-import async_timeout
 import json
 
-from .const import API_ENDPOINT
+from .const import (
+    API_ENDPOINT,
+    BALANCE_OFFSET,
+    DEFAULT_ESTIMATOR,
+    DEFAULT_LIMIT_PER_HOST,
+    DEFAULT_KEEPALIVE_TIMEOUT,
+    DEFAULT_DNS_CACHE_TTL,
+)
+from .estimator import MAX_PROJECTION_DAYS, create_estimator
+from .history import HistoryIndex, InvoiceHistory
+from .metrics import (
+    STAGE_BYTES,
+    STAGE_HTTP,
+    STAGE_PARSE,
+    STAGE_RECORDS,
+    CardMetrics,
+)
+from .parser import (
+    SECONDS_PER_DAY,
+    InvoiceStreamParser,
+    extract_invoice_items,
+    is_invoice_envelope,
+    is_newer_item,
+    parse_invoices,
+)
+from .transport import async_post_json
 
 _LOGGER = logging.getLogger(__name__)
 
+
+def create_session(
+    limit_per_host=DEFAULT_LIMIT_PER_HOST,
+    keepalive_timeout=DEFAULT_KEEPALIVE_TIMEOUT,
+    dns_cache_ttl=DEFAULT_DNS_CACHE_TTL,
+):
+    """Create a pooled session with keep-alive and DNS caching."""
+    connector = aiohttp.TCPConnector(
+        limit_per_host=limit_per_host,
+        keepalive_timeout=keepalive_timeout,
+        use_dns_cache=True,
+        ttl_dns_cache=dns_cache_ttl,
+    )
+    return aiohttp.ClientSession(connector=connector)
+
+
 class XianGasClient:
     """西安天然气 API client."""
 
-    def __init__(self, user_id, card_id, xiuzheng, token_s):
-        """Initialize the client."""
+    def __init__(
+        self,
+        user_id,
+        card_id,
+        xiuzheng,
+        token_s,
+        session=None,
+        estimator=DEFAULT_ESTIMATOR,
+        clock=datetime.now,
+    ):
+        """Initialize the client.
+
+        If a session is passed in it is shared with other clients and is
+        never closed here; otherwise the client creates and owns one.
+        clock returns the local wall-clock time the projection is made for,
+        so a simulator can replay past days.
+        """
         self.user_id = user_id
         self.card_id = card_id
         self.xiuzheng = float(xiuzheng) if xiuzheng else 0
         self.token_s = token_s
-        self.session = None
-        _LOGGER.info("初始化客户端，修正值: %s", self.xiuzheng)
+        self.session = session
+        self._owns_session = session is None
+        self.estimator = estimator
+        self.clock = clock
+        self.metrics = CardMetrics()
+        _LOGGER.debug("初始化客户端，修正值: %s", self.xiuzheng)
 
-    async def async_get_data(self):
-        """Get data from the API."""
+    async def async_fetch_invoices(self, since=None, before_attempt=None):
+        """Fetch the invoice response from the API.
+
+        The body is parsed as it streams in and only items dated at or after
+        the since timestamp are kept, so the result is an envelope of new
+        items. before_attempt is awaited before every request attempt.
+        """
         if self.session is None:
-            self.session = aiohttp.ClientSession()
+            self.session = create_session()
+            self._owns_session = True
 
         payload = {"data":{"userId":self.user_id,"cardId":self.card_id},"tokenS":self.token_s}
-        async with async_timeout.timeout(20):
-            response = await self.session.post(
-                API_ENDPOINT,
-                data=json.dumps(payload, separators=(',', ':')),
-                headers={"Content-Type": "application/json"}
+        parsers = []
+
+        def _create_parser():
+            parser = InvoiceStreamParser(
+                None if since is None else lambda item: is_newer_item(item, since)
             )
-            
-            response_json = await response.json()
-            _LOGGER.info("API response: %s", response_json)
-            
-            cleaned_data = self._clean_invoice_data(response_json)
-            _LOGGER.info("Cleaned data: %s", cleaned_data)
-            
-            gas_usage = self._calculate_gas_usage(cleaned_data)
-            _LOGGER.info("Gas usage calculation result: %s", gas_usage)
-            
-            result = {
-                "ranqi": gas_usage,
-                "ranqidata": cleaned_data
-            }
-            
-            _LOGGER.info("返回数据: %s", result)
-            return result
+            parsers.append(parser)
+            return parser
+
+        start = perf_counter()
+        # 连接与读取分别超时，临时错误有限次重试，上游宕机时由熔断器快速失败
+        response_json = await async_post_json(
+            self.session,
+            API_ENDPOINT,
+            data=json.dumps(payload, separators=(',', ':')),
+            headers={"Content-Type": "application/json"},
+            parser_factory=_create_parser,
+            before_attempt=before_attempt,
+        )
+        # 只统计最后一次（成功的）尝试的解析；请求耗时包含重试，不含解析
+        parser = parsers[-1]
+        metrics = self.metrics
+        metrics.record(STAGE_HTTP, perf_counter() - start - parser.parse_time)
+        metrics.record(STAGE_BYTES, parser.size)
+        metrics.record(STAGE_PARSE, parser.parse_time)
+        metrics.record(STAGE_RECORDS, parser.total)
+        _LOGGER.debug(
+            "API response for card %s: %s bytes, %s items, %s new",
+            self.card_id,
+            parser.size,
+            parser.total,
+            len(response_json.get("data") or ()),
+        )
+        return response_json
+
+    async def async_validate(self):
+        """Fetch once and check only the response envelope.
+
+        Returns the raw response so it can be reused, or None if it does
+        not look like an invoice response.
+        """
+        response_json = await self.async_fetch_invoices()
+        if not is_invoice_envelope(response_json):
+            _LOGGER.warning("Unexpected API response for card %s", self.card_id)
+            return None
+        return response_json
+
+    async def async_get_data(self):
+        """Get data from the API."""
+        response_json = await self.async_fetch_invoices()
+
+        cleaned_data = self._clean_invoice_data(response_json)
+        gas_usage = self._calculate_gas_usage(cleaned_data)
+        
+        result = {
+            "ranqi": gas_usage,
+            "ranqidata": cleaned_data
+        }
+        
+        # 完整数据只在开启调试日志时才格式化
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("返回数据: %s, %s", gas_usage, cleaned_data.as_dicts())
+        return result
+
+    def _extract_invoice_items(self, original_data):
+        """Unwrap the raw response into the list of invoice items."""
+        return extract_invoice_items(original_data)
 
     def _clean_invoice_data(self, original_data):
-        """Clean the invoice data."""
+        """Clean the invoice data into a compact history."""
         try:
-            _LOGGER.info("Original data type: %s", type(original_data))
-            
-            # 处理字符串或对象
-            if isinstance(original_data, str):
-                try:
-                    data = json.loads(original_data)
-                    _LOGGER.info("Parsed JSON from string")
-                except json.JSONDecodeError as e:
-                    _LOGGER.error("Failed to parse JSON string: %s", e)
-                    return []
-            else:
-                data = original_data
-            
-            # 检查数据结构
-            if isinstance(data, dict) and "data" in data:
-                _LOGGER.info("Found 'data' key in response")
-                data = data.get("data", [])
-            
-            # 确保数据是列表类型
-            if not isinstance(data, list):
-                _LOGGER.warning("Data is not a list, type: %s", type(data))
-                data = []
-            
-            cleaned_data = []
-            for item in data:
-                if not isinstance(item, dict):
-                    _LOGGER.warning("Item is not a dictionary: %s", item)
-                    continue
-                    
-                date_value = item.get("dt", "")
-                cost_value = item.get("fee", 0)
-                
-                # 确保日期格式正确
-                if not date_value:
-                    _LOGGER.warning("Missing date value")
-                    continue
-                    
-                if not self._is_valid_date_format(date_value):
-                    _LOGGER.warning("Invalid date format: %s, expected YYYY-MM-DD or YYYY-MM-DD HH:MM:SS", date_value)
-                    continue
-                
-                # 确保费用是数字
-                try:
-                    cost_value = float(cost_value)
-                except (ValueError, TypeError):
-                    _LOGGER.warning("Invalid cost value: %s", cost_value)
-                    cost_value = 0
-                
-                cleaned_data.append({
-                    "date": date_value,  # 交易日期
-                    "cost": cost_value   # 开票金额
-                })
-            
-            _LOGGER.info("Cleaned data count: %s", len(cleaned_data))
+            cleaned_data = InvoiceHistory.from_records(parse_invoices(original_data))
+            _LOGGER.debug("Cleaned data count: %s", len(cleaned_data))
             return cleaned_data
         except Exception as err:
             _LOGGER.error("Error cleaning invoice data: %s", err)
-            return []
-            
-    def _is_valid_date_format(self, date_str):
-        """Check if the date string has a valid format (YYYY-MM-DD or YYYY-MM-DD HH:MM:SS)."""
-        try:
-            # 尝试解析 YYYY-MM-DD 格式
-            datetime.strptime(date_str, "%Y-%m-%d")
-            return True
-        except ValueError:
-            try:
-                # 尝试解析 YYYY-MM-DD HH:MM:SS 格式
-                datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
-                return True
-            except ValueError:
-                return False
+            return InvoiceHistory()
 
     def _calculate_gas_usage(self, data):
         """Calculate gas usage statistics."""
+        estimator = self._summarize_gas_usage(HistoryIndex.from_history(data))
+        if estimator is None:
+            return None
+        return self._project_gas_usage(estimator)
+
+    def _summarize_gas_usage(self, index):
+        """Feed the sorted history index into a fresh estimator.
+
+        The latest recharge is the newest record of the index, whatever
+        order upstream returned them in.
+        """
+        _LOGGER.debug("Gas usage calculation records: %s", len(index))
+        if not index:
+            _LOGGER.warning("No data available to calculate gas usage")
+            return None
+        if len(index) < 2:
+            _LOGGER.warning("Insufficient data to calculate gas usage, need at least 2 records, got %s", len(index))
+            return None
+
+        estimator = create_estimator(self.estimator)
+        estimator.update(index.items())
+        return estimator
+
+    def _project_gas_usage(self, estimator):
+        """Project balance and remaining days for today from an estimator."""
         try:
-            _LOGGER.info("Gas usage calculation data: %s", data)
-            if not data:
-                _LOGGER.warning("No data available to calculate gas usage")
-                return None
-            if len(data) < 2:
-                _LOGGER.warning("Insufficient data to calculate gas usage, need at least 2 records, got %s", len(data))
-                return None
-                
-            # 解析日期
-            try:
-                # 尝试解析日期，支持两种格式
-                first_date_str = data[0]["date"]
-                last_date_str = data[-1]["date"]
-                
-                # 解析第一个日期
-                try:
-                    first_date = datetime.strptime(first_date_str, "%Y-%m-%d")
-                except ValueError:
-                    first_date = datetime.strptime(first_date_str, "%Y-%m-%d %H:%M:%S")
-                
-                # 解析最后一个日期
-                try:
-                    last_date = datetime.strptime(last_date_str, "%Y-%m-%d")
-                except ValueError:
-                    last_date = datetime.strptime(last_date_str, "%Y-%m-%d %H:%M:%S")
-                
-                _LOGGER.info("First date: %s, Last date: %s", first_date, last_date)
-            except ValueError as e:
-                _LOGGER.error("Date parsing error: %s. Date format should be YYYY-MM-DD or YYYY-MM-DD HH:MM:SS", e)
-                _LOGGER.error("First record date: %s, Last record date: %s", 
-                             data[0].get("date", "missing"), data[-1].get("date", "missing"))
-                return None
-            
-            # 计算天数差，向上取整
-            s1 = (last_date - first_date).days
-            s1 = abs(s1) if s1 != 0 else 1  # 确保不为零
-            
-            # 计算除第一条外所有记录的费用总和
-            a = sum(float(item["cost"]) for item in data[1:])
+            today = self.clock().toordinal()
             
-            # 计算每日消耗
-            c = a / s1
+            # 计算从最近一次充值到今天的天数
+            s2 = abs((today * SECONDS_PER_DAY - estimator.latest_ts) // SECONDS_PER_DAY)
             
-            # 计算从第一条记录到今天的天数
-            today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-            s2 = abs((today - first_date).days)
+            # 计算每日消耗和这段时间的估算花费
+            c = estimator.daily_cost(today)
+            spent = estimator.spend_between(estimator.latest_ts // SECONDS_PER_DAY, s2)
             
             # 计算剩余金额和可用天数
-            b = float(data[0]["cost"])
-            _LOGGER.info("原始余额: %s, 修正值: %s", b, self.xiuzheng)
-            estimated_balance = b - (c * s2) + 10 + self.xiuzheng  # 加上10元作为基础余额和修正值
-            _LOGGER.info("计算后余额: %s", estimated_balance)
-            estimated_usage_days = estimated_balance / c if c > 0 else 0
+            b = estimator.latest_cost
+            _LOGGER.debug("原始余额: %s, 修正值: %s", b, self.xiuzheng)
+            estimated_balance = b - spent + BALANCE_OFFSET + self.xiuzheng  # 加上基础余额和修正值
+            _LOGGER.debug("计算后余额: %s", estimated_balance)
+            estimated_usage_days = estimator.days_until_empty(estimated_balance, today)
+            # 日均消费极小时天数会大到无法换算成日期，与分季节估算一样限制在推算范围内
+            estimated_usage_days = max(
+                -MAX_PROJECTION_DAYS, min(estimated_usage_days, MAX_PROJECTION_DAYS)
+            )
             
             return {
                 "price": round(c, 2),
                 "balance": round(estimated_balance, 2),
                 "usage_days": int(estimated_usage_days),
-                "data": data
             }
         except (ValueError, ZeroDivisionError) as err:
             _LOGGER.error("Error calculating gas usage: %s", err)
             return None
 
     async def async_close(self):
-        """Close the session."""
-        if self.session:
+        """Close the session if this client owns it."""
+        if self.session and self._owns_session:
             await self.session.close()
-            self.session = None
+        self.session = None
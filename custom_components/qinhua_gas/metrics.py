@@ -0,0 +1,85 @@
+"""Per-card refresh metrics for 西安天然气."""
+from __future__ import annotations
+
+from collections import deque
+from typing import Any
+
+from .const import METRICS_WINDOW
+
+STAGE_HTTP = "http_latency"
+STAGE_BYTES = "bytes_received"
+STAGE_PARSE = "parse_time"
+STAGE_RECORDS = "record_count"
+STAGE_COMPUTE = "compute_time"
+
+STAGES = (STAGE_HTTP, STAGE_BYTES, STAGE_PARSE, STAGE_RECORDS, STAGE_COMPUTE)
+
+
+def _nearest_rank(ordered: list[float], fraction: float) -> float:
+    """Return the nearest-rank percentile of sorted samples."""
+    rank = round(fraction * len(ordered)) - 1
+    return ordered[max(0, min(len(ordered) - 1, rank))]
+
+
+class RollingHistogram:
+    """The last size samples of one metric, summarized on demand."""
+
+    __slots__ = ("samples",)
+
+    def __init__(self, size: int = METRICS_WINDOW) -> None:
+        """Initialize an empty histogram."""
+        self.samples: deque[float] = deque(maxlen=size)
+
+    def add(self, value: float) -> None:
+        """Record one sample, dropping the oldest when full."""
+        self.samples.append(value)
+
+    @property
+    def last(self) -> float | None:
+        """Return the newest sample."""
+        return self.samples[-1] if self.samples else None
+
+    def percentile(self, fraction: float) -> float | None:
+        """Return the nearest-rank percentile, or None without samples."""
+        if not self.samples:
+            return None
+        return _nearest_rank(sorted(self.samples), fraction)
+
+    def summary(self) -> dict[str, Any]:
+        """Return count, mean, min, p50, p90, p99, max and last."""
+        if not self.samples:
+            return {"count": 0}
+        ordered = sorted(self.samples)
+        count = len(ordered)
+        return {
+            "count": count,
+            "mean": sum(ordered) / count,
+            "min": ordered[0],
+            "p50": _nearest_rank(ordered, 0.5),
+            "p90": _nearest_rank(ordered, 0.9),
+            "p99": _nearest_rank(ordered, 0.99),
+            "max": ordered[-1],
+            "last": self.samples[-1],
+        }
+
+
+class CardMetrics:
+    """Rolling timing and size histograms of one card's refreshes.
+
+    Times are in seconds, sizes in bytes and records.
+    """
+
+    def __init__(self, size: int = METRICS_WINDOW) -> None:
+        """Initialize one histogram per stage."""
+        self.stages = {stage: RollingHistogram(size) for stage in STAGES}
+        # 每记录一次加一，供传感器判断是否需要写状态
+        self.updates = 0
+
+    def record(self, stage: str, value: float) -> None:
+        """Record one sample of a stage."""
+        self.stages[stage].add(value)
+        self.updates += 1
+
+    def as_dict(self) -> dict[str, dict[str, Any]]:
+        """Return the summary of every stage."""
+        return {stage: histogram.summary() for stage, histogram in self.stages.items()}
@@ -0,0 +1,360 @@
+"""Invoice response parser for 西安天然气."""
+from __future__ import annotations
+
+import codecs
+from datetime import date, datetime, time
+import json
+import logging
+from time import perf_counter
+import re
+from typing import Any, Callable, NamedTuple
+
+_LOGGER = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 86400
+
+# 与 float() 接受的普通十进制写法一致，但不含 inf/nan
+_NUMBER_RE = re.compile(r"\s*[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?\s*")
+_WHITESPACE_RE = re.compile(r"[ \t\n\r]*")
+# 数字在分块处截断时，剩余部分只可能由这些字符组成
+_NUMBER_TAIL_RE = re.compile(r"[0-9.eE+-]*")
+
+# 流式解析的状态
+_START = 0
+_KEY = 1
+_COLON = 2
+_VALUE = 3
+_OBJECT_NEXT = 4
+_ITEM = 5
+_ARRAY_NEXT = 6
+_DONE = 7
+_STRING = 8
+
+
+class InvoiceRecord(NamedTuple):
+    """One cleaned invoice.
+
+    ts is the local wall-clock time in seconds since 0001-01-01, so that
+    ts // 86400 is the date ordinal and differences floor like timedelta.
+    """
+
+    date: str
+    cost: float
+    ts: int
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the record in the attribute/storage format."""
+        return {"date": self.date, "cost": self.cost}
+
+
+def parse_timestamp(date_str: Any) -> int | None:
+    """Parse YYYY-MM-DD or YYYY-MM-DD HH:MM:SS into a record timestamp."""
+    if not isinstance(date_str, str):
+        return None
+    length = len(date_str)
+    try:
+        # 规范格式走 fromisoformat 快速路径
+        if length == 10 and date_str[4] == "-" and date_str[7] == "-":
+            return date.fromisoformat(date_str).toordinal() * SECONDS_PER_DAY
+        if (
+            length == 19
+            and date_str[4] == "-"
+            and date_str[7] == "-"
+            and date_str[10] == " "
+            and date_str[13] == ":"
+            and date_str[16] == ":"
+        ):
+            day = date.fromisoformat(date_str[:10]).toordinal()
+            moment = time.fromisoformat(date_str[11:])
+            return (
+                day * SECONDS_PER_DAY
+                + moment.hour * 3600
+                + moment.minute * 60
+                + moment.second
+            )
+    except ValueError:
+        return None
+
+    # 非零填充等少见写法（如 2024-1-5）按原有 strptime 规则兼容
+    for fmt in ("%Y-%m-%d", "%Y-%m-%d %H:%M:%S"):
+        try:
+            parsed = datetime.strptime(date_str, fmt)
+        except ValueError:
+            continue
+        return (
+            parsed.toordinal() * SECONDS_PER_DAY
+            + parsed.hour * 3600
+            + parsed.minute * 60
+            + parsed.second
+        )
+    return None
+
+
+def parse_cost(value: Any) -> float | None:
+    """Coerce a fee value to float, or None if it is not a number."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str) and _NUMBER_RE.fullmatch(value):
+        return float(value)
+    return None
+
+
+def extract_invoice_items(original_data: Any) -> list[Any]:
+    """Unwrap the raw response (object or JSON string) into its item list."""
+    # 处理字符串或对象
+    if isinstance(original_data, str):
+        try:
+            data = json.loads(original_data)
+        except json.JSONDecodeError as e:
+            _LOGGER.error("Failed to parse JSON string: %s", e)
+            return []
+    else:
+        data = original_data
+
+    # 检查数据结构
+    if isinstance(data, dict) and "data" in data:
+        data = data.get("data", [])
+
+    # 确保数据是列表类型
+    if not isinstance(data, list):
+        _LOGGER.warning("Data is not a list, type: %s", type(data))
+        return []
+    return data
+
+
+def is_invoice_envelope(original_data: Any) -> bool:
+    """Return True if a response has the invoice envelope, without parsing items."""
+    data = original_data
+    if isinstance(data, str):
+        try:
+            data = json.loads(data)
+        except json.JSONDecodeError:
+            return False
+    if isinstance(data, dict):
+        data = data.get("data")
+    return isinstance(data, list)
+
+
+def is_newer_item(item: Any, since: int | None) -> bool:
+    """Return True if an upstream item is dated at or after the since timestamp.
+
+    Dates are compared as parsed timestamps, since upstream does not always
+    zero-pad them; items at since itself are kept for the caller to dedupe.
+    """
+    if not isinstance(item, dict) or not item.get("dt"):
+        return False
+    if since is None:
+        return True
+    ts = parse_timestamp(item["dt"])
+    return ts is not None and ts >= since
+
+
+class InvoiceStreamParser:
+    """Incremental decoder for the invoice response envelope.
+
+    Bytes are fed as they arrive. Each item of the data array is decoded on
+    its own and kept only if keep(item) is true, so memory is bounded by
+    the kept items plus the item being decoded, not by the whole body.
+    """
+
+    def __init__(self, keep: Callable[[Any], bool] | None = None) -> None:
+        """Initialize the parser."""
+        self._keep = keep
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        # 字符串包裹的响应体只收集分块，留到 close() 时一次拼接
+        self._chunks: list[str] = []
+        self._state = _START
+        self._key: str | None = None
+        self._top_list = False
+        self._found = False
+        self.envelope: dict[str, Any] = {}
+        self.items: list[Any] = []
+        self.total = 0
+        self.size = 0
+        self.parse_time = 0.0
+
+    def feed(self, chunk: bytes) -> None:
+        """Decode one chunk of the body."""
+        start = perf_counter()
+        self.size += len(chunk)
+        text = self._decoder.decode(chunk)
+        if self._state == _STRING:
+            self._chunks.append(text)
+        else:
+            # 只保留尚未解析完的尾部
+            self._buffer = self._buffer[self._pos:] + text
+            self._pos = 0
+            self._parse(False)
+        self.parse_time += perf_counter() - start
+
+    def close(self) -> dict[str, Any]:
+        """Finish decoding and return the envelope with the kept items.
+
+        The result has no data key if the body had no data array, so it
+        reads like any other malformed response downstream.
+        """
+        start = perf_counter()
+        if self._state == _STRING:
+            self._chunks.append(self._decoder.decode(b"", True))
+            return self._close_string(start)
+        self._buffer = self._buffer[self._pos:] + self._decoder.decode(b"", True)
+        self._pos = 0
+        self._parse(True)
+        self.parse_time += perf_counter() - start
+        if self._state != _DONE:
+            raise ValueError("truncated invoice response")
+        if not self._found:
+            return self.envelope
+        return {**self.envelope, "data": self.items}
+
+    def _close_string(self, start: float) -> dict[str, Any]:
+        """Parse a body that is a JSON string holding the real JSON document."""
+        # 少见的字符串包裹写法无法流式解析，整体解码后再解析内层文档
+        body = self._json.decode(self._buffer[self._pos:] + "".join(self._chunks))
+        self._chunks = []
+        inner = InvoiceStreamParser(self._keep)
+        inner.feed(body.encode())
+        result = inner.close()
+        self.total = inner.total
+        self.parse_time += perf_counter() - start
+        return result
+
+    def _decode(self, buffer: str, pos: int, final: bool) -> tuple[Any, int] | None:
+        """Decode one value at pos, or return None if more data is needed."""
+        try:
+            value, end = self._json.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return None
+        if final:
+            return value, end
+        # 值后面至少还要有一个分隔符，否则数字等可能只到了一半
+        if end >= len(buffer):
+            return None
+        # 1.5 可能被拆成 "1." 和 "5"：数字后面只剩数字字符时继续等待
+        if (
+            isinstance(value, (int, float))
+            and not isinstance(value, bool)
+            and _NUMBER_TAIL_RE.fullmatch(buffer, end)
+        ):
+            return None
+        return value, end
+
+    def _parse(self, final: bool) -> None:
+        """Advance through the buffer as far as complete values allow."""
+        buffer = self._buffer
+        length = len(buffer)
+        pos = self._pos
+        state = self._state
+        while True:
+            pos = _WHITESPACE_RE.match(buffer, pos).end()
+            if pos >= length:
+                break
+            if state == _STRING:
+                break
+            char = buffer[pos]
+            if state == _START:
+                if char == "{":
+                    state = _KEY
+                elif char == "[":
+                    self._top_list = self._found = True
+                    state = _ITEM
+                elif char == '"':
+                    # 整个响应被编码成字符串，留到 close() 时一次性处理
+                    state = _STRING
+                    break
+                else:
+                    raise ValueError("invoice response is not a JSON object or list")
+                pos += 1
+            elif state == _KEY:
+                if char == "}":
+                    state = _DONE
+                    pos += 1
+                    continue
+                decoded = self._decode(buffer, pos, final)
+                if decoded is None:
+                    break
+                self._key, pos = decoded
+                state = _COLON
+            elif state == _COLON:
+                if char != ":":
+                    raise ValueError(f"unexpected {char!r} in invoice response")
+                state = _VALUE
+                pos += 1
+            elif state == _VALUE:
+                if self._key == "data" and char == "[":
+                    self._found = True
+                    state = _ITEM
+                    pos += 1
+                    continue
+                decoded = self._decode(buffer, pos, final)
+                if decoded is None:
+                    break
+                self.envelope[self._key], pos = decoded
+                state = _OBJECT_NEXT
+            elif state == _OBJECT_NEXT:
+                if char == ",":
+                    state = _KEY
+                elif char == "}":
+                    state = _DONE
+                else:
+                    raise ValueError(f"unexpected {char!r} in invoice response")
+                pos += 1
+            elif state in (_ITEM, _ARRAY_NEXT):
+                if char == "]":
+                    state = _DONE if self._top_list else _OBJECT_NEXT
+                    pos += 1
+                elif state == _ARRAY_NEXT:
+                    if char != ",":
+                        raise ValueError(f"unexpected {char!r} in invoice response")
+                    state = _ITEM
+                    pos += 1
+                else:
+                    decoded = self._decode(buffer, pos, final)
+                    if decoded is None:
+                        break
+                    item, pos = decoded
+                    self.total += 1
+                    if self._keep is None or self._keep(item):
+                        self.items.append(item)
+                    state = _ARRAY_NEXT
+            else:
+                raise ValueError("unexpected data after invoice response")
+        self._pos = pos
+        self._state = state
+
+
+def parse_invoices(original_data: Any) -> list[InvoiceRecord]:
+    """Parse a response into records in one pass, each date parsed once."""
+    records: list[InvoiceRecord] = []
+    append = records.append
+    for item in extract_invoice_items(original_data):
+        if not isinstance(item, dict):
+            _LOGGER.warning("Item is not a dictionary: %s", item)
+            continue
+
+        date_value = item.get("dt", "")
+        if not date_value:
+            _LOGGER.warning("Missing date value")
+            continue
+
+        ts = parse_timestamp(date_value)
+        if ts is None:
+            _LOGGER.warning(
+                "Invalid date format: %s, expected YYYY-MM-DD or YYYY-MM-DD HH:MM:SS",
+                date_value,
+            )
+            continue
+
+        cost_value = item.get("fee", 0)
+        cost = parse_cost(cost_value)
+        if cost is None:
+            _LOGGER.warning("Invalid cost value: %s", cost_value)
+            cost = 0.0
+
+        append(InvoiceRecord(date_value, cost, ts))
+    return records
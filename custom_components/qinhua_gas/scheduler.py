@@ -0,0 +1,73 @@
+"""Adaptive poll scheduling for 西安天然气."""
+from __future__ import annotations
+
+from datetime import timedelta
+import random
+
+from .const import (
+    MAX_BACKOFF_STEPS,
+    MAX_POLL_INTERVAL,
+    MIN_POLL_INTERVAL,
+    NEAR_RUNOUT_DAYS,
+    POLL_JITTER,
+    RETRY_INTERVAL,
+    SCAN_INTERVAL,
+    STARTUP_JITTER,
+)
+
+
+class PollScheduler:
+    """Decide how long a card waits before its next upstream poll.
+
+    Cards whose history keeps coming back unchanged are polled less and
+    less often, cards within a few days of their projected run-out (when
+    a recharge is expected) are polled often, cards long past it at least
+    every base interval, failures retry with
+    exponential backoff, and every delay is jittered so cards do not poll
+    in lockstep.
+    """
+
+    def __init__(
+        self,
+        base_interval: timedelta = SCAN_INTERVAL,
+        rng: random.Random | None = None,
+    ) -> None:
+        """Initialize the scheduler."""
+        self.base_interval = base_interval
+        self.min_interval = min(MIN_POLL_INTERVAL, base_interval)
+        self.max_interval = max(MAX_POLL_INTERVAL, base_interval)
+        self._rng = rng or random.Random()
+
+    def delay_after_success(
+        self, usage_days: int | None, stable_polls: int
+    ) -> timedelta:
+        """Return the delay after a successful poll."""
+        # 连续没有新记录时逐步拉长间隔
+        delay = min(
+            self.base_interval * 2 ** min(stable_polls, MAX_BACKOFF_STEPS),
+            self.max_interval,
+        )
+        if usage_days is not None:
+            if abs(usage_days) <= NEAR_RUNOUT_DAYS:
+                # 预计用完前后几天内随时可能充值
+                delay = self.min_interval
+            elif usage_days > 0:
+                # 不要越过预计用完前的那几天
+                delay = min(delay, timedelta(days=usage_days - NEAR_RUNOUT_DAYS))
+            else:
+                # 已过预计用完日较久，充值随时会到，不再按稳定历史退避
+                delay = min(delay, self.base_interval)
+        return self._jitter(max(delay, self.min_interval))
+
+    def delay_after_failure(self, failures: int) -> timedelta:
+        """Return the retry delay after the given number of failures."""
+        delay = RETRY_INTERVAL * 2 ** min(failures - 1, 16)
+        return self._jitter(min(delay, self.base_interval))
+
+    def startup_delay(self) -> timedelta:
+        """Return a random delay for the first poll after a warm start."""
+        return STARTUP_JITTER * self._rng.random()
+
+    def _jitter(self, delay: timedelta) -> timedelta:
+        """Spread a delay by up to POLL_JITTER in either direction."""
+        return delay * self._rng.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
@@ -1,6 +1,7 @@
 """Sensor platform for 西安天然气 integration."""
 from __future__ import annotations
 
+from dataclasses import dataclass
 import logging
 from datetime import timedelta
 from typing import Any, Callable, Dict, Optional
@@ -11,7 +12,9 @@ from homeassistant.components.sensor import (
     SensorStateClass,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.const import EntityCategory, UnitOfInformation, UnitOfTime
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.typing import StateType
@@ -29,22 +32,165 @@ from .const import (
     NAME,
     SCAN_INTERVAL,
 )
+from .metrics import (
+    STAGE_BYTES,
+    STAGE_COMPUTE,
+    STAGE_HTTP,
+    STAGE_PARSE,
+    STAGE_RECORDS,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True)
+class XianGasSensorDescription:
+    """Describe a sensor that reads one value from the coordinator data."""
+
+    sensor_type: str
+    name: str
+    icon: str
+    unit: Optional[str]
+    device_class: Optional[str]
+    state_class: Optional[str]
+    value_fn: Callable[[Dict[str, Any]], StateType]
+
+
+def _ranqi_value(key: str) -> Callable[[Dict[str, Any]], StateType]:
+    """Return a getter for one projection value."""
+    return lambda data: (data.get("ranqi") or {}).get(key)
+
+
+def _last_recharge_value(key: str) -> Callable[[Dict[str, Any]], StateType]:
+    """Return a getter for one field of the latest recharge."""
+    return lambda data: (data.get("last_recharge") or {}).get(key)
+
+
+# 全部读取同一次计算结果，不各自重算
+VALUE_SENSORS: tuple[XianGasSensorDescription, ...] = (
+    XianGasSensorDescription(
+        "daily_cost",
+        "日均消费",
+        "mdi:cash-clock",
+        "¥/d",
+        None,
+        SensorStateClass.MEASUREMENT,
+        _ranqi_value(ATTR_PRICE),
+    ),
+    XianGasSensorDescription(
+        "usage_days",
+        "剩余天数",
+        "mdi:calendar-clock",
+        UnitOfTime.DAYS,
+        SensorDeviceClass.DURATION,
+        SensorStateClass.MEASUREMENT,
+        _ranqi_value(ATTR_USAGE_DAYS),
+    ),
+    XianGasSensorDescription(
+        "runout_date",
+        "预计用完日期",
+        "mdi:calendar-alert",
+        None,
+        SensorDeviceClass.DATE,
+        None,
+        lambda data: data.get("runout"),
+    ),
+    XianGasSensorDescription(
+        "last_recharge_cost",
+        "最近充值金额",
+        "mdi:cash-plus",
+        "¥",
+        SensorDeviceClass.MONETARY,
+        None,
+        _last_recharge_value("cost"),
+    ),
+    XianGasSensorDescription(
+        "last_recharge_date",
+        "最近充值日期",
+        "mdi:calendar-check",
+        None,
+        SensorDeviceClass.DATE,
+        None,
+        _last_recharge_value("date"),
+    ),
+    XianGasSensorDescription(
+        "total_spend",
+        "充值总额",
+        "mdi:cash-multiple",
+        "¥",
+        SensorDeviceClass.MONETARY,
+        SensorStateClass.TOTAL,
+        lambda data: data.get("total") if data.get("count") else None,
+    ),
+)
+
+
+# 诊断传感器：状态为最近若干次刷新的中位数，默认禁用
+METRIC_SENSORS: dict[str, tuple[str, str, Optional[str], Optional[str]]] = {
+    STAGE_HTTP: (
+        "请求耗时", "mdi:timer-outline", UnitOfTime.SECONDS, SensorDeviceClass.DURATION
+    ),
+    STAGE_BYTES: (
+        "响应大小", "mdi:download", UnitOfInformation.BYTES, SensorDeviceClass.DATA_SIZE
+    ),
+    STAGE_PARSE: (
+        "解析耗时", "mdi:timer-cog-outline", UnitOfTime.SECONDS, SensorDeviceClass.DURATION
+    ),
+    STAGE_RECORDS: ("响应记录数", "mdi:format-list-numbered", None, None),
+    STAGE_COMPUTE: (
+        "计算耗时", "mdi:timer-sand", UnitOfTime.SECONDS, SensorDeviceClass.DURATION
+    ),
+}
+
+
 async def async_setup_entry(
     hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
 ) -> None:
     """Set up 西安天然气 sensor based on a config entry."""
     coordinator = hass.data[DOMAIN][entry.entry_id]
 
+    window_sensors = {
+        window: XianGasWindowCostSensor(coordinator, entry, window)
+        for window in (*coordinator.windows, "heating")
+    }
     entities = [
         XianGasBalanceSensor(coordinator, entry),
+        *(
+            XianGasValueSensor(coordinator, entry, description)
+            for description in VALUE_SENSORS
+        ),
+        *window_sensors.values(),
     ]
 
+    entities.extend(
+        XianGasMetricSensor(coordinator, entry, stage, *METRIC_SENSORS[stage])
+        for stage in METRIC_SENSORS
+    )
+
     async_add_entities(entities)
 
+    @callback
+    def _async_update_windows() -> None:
+        """Add and remove window sensors after the window option changed."""
+        windows = (*coordinator.windows, "heating")
+        registry = er.async_get(hass)
+        for window in [window for window in window_sensors if window not in windows]:
+            sensor = window_sensors.pop(window)
+            # 从实体注册表删除，实体会随之从平台移除
+            if sensor.entity_id and registry.async_get(sensor.entity_id):
+                registry.async_remove(sensor.entity_id)
+            else:
+                hass.async_create_task(sensor.async_remove())
+        added = {
+            window: XianGasWindowCostSensor(coordinator, entry, window)
+            for window in windows
+            if window not in window_sensors
+        }
+        window_sensors.update(added)
+        async_add_entities(added.values())
+
+    entry.async_on_unload(coordinator.async_add_windows_listener(_async_update_windows))
+
 
 class XianGasBaseSensor(CoordinatorEntity, SensorEntity):
     """Base class for 西安天然气 sensors."""
@@ -69,7 +215,9 @@ class XianGasBaseSensor(CoordinatorEntity, SensorEntity):
         self._attr_icon = icon
         self._attr_native_unit_of_measurement = unit
         self._attr_device_class = device_class
+        self._attr_state_class = state_class
         self._attr_has_entity_name = True
+        self._cache_key: tuple[Any, bool] | None = None
 
     @property
     def device_info(self) -> DeviceInfo:
@@ -84,8 +232,40 @@ class XianGasBaseSensor(CoordinatorEntity, SensorEntity):
         """Return if entity is available."""
         if not self.coordinator.data:
             return False
+        # 热启动模式下刷新失败时继续显示上次的数据，新鲜度见“数据更新时间”属性
+        if self.coordinator.warm_start:
+            return True
         return super().available
 
+    async def async_added_to_hass(self) -> None:
+        """Fill the cached values before the first state write."""
+        self._update_cache()
+        await super().async_added_to_hass()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write state only when the derived values or availability changed."""
+        if self._update_cache():
+            self.async_write_ha_state()
+
+    def _update_cache(self) -> bool:
+        """Recompute cached values if the data version changed."""
+        data = self.coordinator.data
+        cache_key = (self._data_version(data), self.available)
+        if cache_key == self._cache_key:
+            return False
+        self._cache_key = cache_key
+        self._update_from_data(data or {})
+        return True
+
+    def _data_version(self, data: Optional[Dict[str, Any]]) -> Any:
+        """Return what the cached values depend on."""
+        return data.get("version") if data else None
+
+    def _update_from_data(self, data: Dict[str, Any]) -> None:
+        """Set the _attr_ values from coordinator data."""
+        raise NotImplementedError
+
 
 class XianGasBalanceSensor(XianGasBaseSensor):
     """Sensor for gas balance."""
@@ -106,21 +286,127 @@ class XianGasBalanceSensor(XianGasBaseSensor):
         )
         self.entity_id = "sensor.xian_gas"
 
-    @property
-    def native_value(self) -> StateType:
-        """Return the state of the sensor."""
-        if not self.coordinator.data or not self.coordinator.data.get("ranqi"):
+    def _data_version(self, data: Optional[Dict[str, Any]]) -> Any:
+        """Return the data version and the time of the last successful refresh."""
+        if not data:
             return None
-        return self.coordinator.data.get("ranqi", {}).get(ATTR_BALANCE)
+        # “数据更新时间”表示最近一次成功刷新，值不变时也要更新
+        return (data.get("version"), data.get("updated"))
 
-    @property
-    def extra_state_attributes(self) -> Dict[str, Any]:
-        """Return the state attributes."""
-        if not self.coordinator.data or not self.coordinator.data.get("ranqi"):
-            return {}
-        ranqi_data = self.coordinator.data.get("ranqi", {})
-        return {
+    def _update_from_data(self, data: Dict[str, Any]) -> None:
+        """Set the state and attributes from coordinator data."""
+        ranqi_data = data.get("ranqi")
+        if not ranqi_data:
+            self._attr_native_value = None
+            self._attr_extra_state_attributes = {}
+            return
+        self._attr_native_value = ranqi_data.get(ATTR_BALANCE)
+        self._attr_extra_state_attributes = {
             "日均消费": ranqi_data.get(ATTR_PRICE),
             "剩余天数": ranqi_data.get(ATTR_USAGE_DAYS),
-            "充值明细": self.coordinator.data.get("ranqidata", []),
-        }
\ No newline at end of file
+            "最近充值": data.get("recent", []),
+            "充值总额": data.get("total"),
+            "充值次数": data.get("count"),
+            "数据更新时间": data.get("updated"),
+        }
+
+
+class XianGasWindowCostSensor(XianGasBaseSensor):
+    """Sensor for the average daily spend over a rolling window."""
+
+    def __init__(
+        self,
+        coordinator: DataUpdateCoordinator,
+        config_entry: ConfigEntry,
+        window: int | str,
+    ) -> None:
+        """Initialize the sensor."""
+        if window == "heating":
+            sensor_type = "daily_cost_heating"
+            name = "本供暖季日均消费"
+        else:
+            sensor_type = f"daily_cost_{window}d"
+            name = f"近{window}天日均消费"
+        super().__init__(
+            coordinator,
+            config_entry,
+            sensor_type,
+            name,
+            "mdi:cash-clock",
+            "¥/d",
+            None,
+            SensorStateClass.MEASUREMENT,
+        )
+        self._window = window
+
+    def _update_from_data(self, data: Dict[str, Any]) -> None:
+        """Set the state from coordinator data."""
+        self._attr_native_value = data.get("windows", {}).get(self._window)
+
+
+class XianGasValueSensor(XianGasBaseSensor):
+    """Sensor for one value of the shared projection result."""
+
+    def __init__(
+        self,
+        coordinator: DataUpdateCoordinator,
+        config_entry: ConfigEntry,
+        description: XianGasSensorDescription,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(
+            coordinator,
+            config_entry,
+            description.sensor_type,
+            description.name,
+            description.icon,
+            description.unit,
+            description.device_class,
+            description.state_class,
+        )
+        self._value_fn = description.value_fn
+
+    def _update_from_data(self, data: Dict[str, Any]) -> None:
+        """Set the state from coordinator data."""
+        self._attr_native_value = self._value_fn(data)
+
+
+class XianGasMetricSensor(XianGasBaseSensor):
+    """Diagnostic sensor for the median of one refresh stage."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(
+        self,
+        coordinator: DataUpdateCoordinator,
+        config_entry: ConfigEntry,
+        stage: str,
+        name: str,
+        icon: str,
+        unit: Optional[str],
+        device_class: Optional[str],
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(
+            coordinator,
+            config_entry,
+            f"metric_{stage}",
+            name,
+            icon,
+            unit,
+            device_class,
+            SensorStateClass.MEASUREMENT,
+        )
+        self._stage = stage
+
+    def _data_version(self, data: Optional[Dict[str, Any]]) -> Any:
+        """Return the metrics update counter."""
+        return self.coordinator.client.metrics.updates
+
+    def _update_from_data(self, data: Dict[str, Any]) -> None:
+        """Set the state and attributes from the card metrics."""
+        histogram = self.coordinator.client.metrics.stages[self._stage]
+        value = histogram.percentile(0.5)
+        self._attr_native_value = round(value, 6) if value is not None else None
+        self._attr_extra_state_attributes = histogram.summary()
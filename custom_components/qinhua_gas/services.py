@@ -0,0 +1,50 @@
+"""Services for 西安天然气."""
+from __future__ import annotations
+
+import logging
+
+import voluptuous as vol
+
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+)
+from homeassistant.exceptions import ServiceValidationError
+import homeassistant.helpers.config_validation as cv
+
+from .const import CONF_CARD_ID, DOMAIN
+from .coordinator import async_get_fleet
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_RELOAD = "reload"
+
+RELOAD_SCHEMA = vol.Schema({vol.Optional(CONF_CARD_ID): cv.string})
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the integration services."""
+
+    async def _async_reload(call: ServiceCall) -> ServiceResponse:
+        """Refresh one card, or every card, right now."""
+        fleet = async_get_fleet(hass)
+        card_id = call.data.get(CONF_CARD_ID)
+        cards = [
+            card
+            for card in fleet.cards.values()
+            if card_id is None or card.client.card_id == card_id
+        ]
+        if card_id is not None and not cards:
+            raise ServiceValidationError(f"未找到卡号 {card_id}")
+        _LOGGER.debug("手动刷新 %s 张卡", len(cards))
+        return {"cards": await fleet.async_refresh_cards(cards)}
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_RELOAD,
+        _async_reload,
+        schema=RELOAD_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
@@ -0,0 +1,80 @@
+"""Shared HTTP session for 西安天然气."""
+from __future__ import annotations
+
+import logging
+
+import aiohttp
+
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.core import Event, HomeAssistant, callback
+
+from .const import (
+    CONF_DNS_CACHE_TTL,
+    CONF_KEEPALIVE_TIMEOUT,
+    CONF_LIMIT_PER_HOST,
+    DATA_CONFIG,
+    DATA_SESSION,
+    DEFAULT_DNS_CACHE_TTL,
+    DEFAULT_KEEPALIVE_TIMEOUT,
+    DEFAULT_LIMIT_PER_HOST,
+)
+from .http_client import create_session
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class SharedSession:
+    """One pooled session shared by every client of the integration.
+
+    Each user (a config entry or a config flow) holds one share, keyed by
+    its id, so releasing twice or releasing an unknown owner is harmless.
+    The session is closed when the last share is released.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the shared session holder."""
+        self.session: aiohttp.ClientSession | None = None
+        self.owners: set[str] = set()
+
+
+async def async_acquire_session(
+    hass: HomeAssistant, owner: str
+) -> aiohttp.ClientSession:
+    """Take a share of the pooled session for owner."""
+    shared: SharedSession | None = hass.data.get(DATA_SESSION)
+    if shared is None:
+        shared = hass.data[DATA_SESSION] = SharedSession()
+
+        @callback
+        def _async_close_on_stop(event: Event) -> None:
+            if shared.session is not None:
+                hass.async_create_task(shared.session.close())
+                shared.session = None
+            shared.owners.clear()
+
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, _async_close_on_stop)
+
+    if shared.session is None or shared.session.closed:
+        conf = hass.data.get(DATA_CONFIG, {})
+        shared.session = create_session(
+            limit_per_host=conf.get(CONF_LIMIT_PER_HOST, DEFAULT_LIMIT_PER_HOST),
+            keepalive_timeout=conf.get(CONF_KEEPALIVE_TIMEOUT, DEFAULT_KEEPALIVE_TIMEOUT),
+            dns_cache_ttl=conf.get(CONF_DNS_CACHE_TTL, DEFAULT_DNS_CACHE_TTL),
+        )
+        _LOGGER.debug("创建共享连接池")
+
+    shared.owners.add(owner)
+    return shared.session
+
+
+async def async_release_session(hass: HomeAssistant, owner: str) -> None:
+    """Release owner's share, closing the session after the last one."""
+    shared: SharedSession | None = hass.data.get(DATA_SESSION)
+    if shared is None:
+        return
+
+    shared.owners.discard(owner)
+    if not shared.owners and shared.session is not None:
+        await shared.session.close()
+        shared.session = None
+        _LOGGER.debug("关闭共享连接池")
@@ -0,0 +1,81 @@
+"""Long-term statistics import for 西安天然气."""
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time
+import logging
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import (
+    async_add_external_statistics,
+    get_last_statistics,
+)
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN, NAME
+from .history import HistoryIndex
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def spend_statistic_id(card_id: str) -> str:
+    """Return the external statistic id for a card's cumulative spend."""
+    return f"{DOMAIN}:spend_{card_id}".lower()
+
+
+async def async_import_spend_statistics(
+    hass: HomeAssistant, card_id: str, index: HistoryIndex
+) -> None:
+    """Import daily cumulative spend from the last day the recorder has on.
+
+    Each day with recharges becomes one hourly row at local midnight:
+    state is that day's spend and sum is the running total.
+    """
+    if "recorder" not in hass.config.components or not index:
+        return
+
+    statistic_id = spend_statistic_id(card_id)
+    last = await get_instance(hass).async_add_executor_job(
+        get_last_statistics, hass, 1, statistic_id, True, {"sum"}
+    )
+    first = 0
+    if rows := last.get(statistic_id):
+        last_day = dt_util.as_local(
+            dt_util.utc_from_timestamp(rows[0]["start"])
+        ).date().toordinal()
+        # 最后导入的那天重新导入（按 start 覆盖），之后合并的同日充值也能计入
+        first = bisect_left(index.days, last_day)
+    if first >= len(index):
+        return
+
+    days = index.days
+    prefix = index.prefix
+    statistics: list[StatisticData] = []
+    position = first
+    while position < len(days):
+        day = days[position]
+        end = bisect_right(days, day, position)
+        start = datetime.combine(
+            date.fromordinal(day), time(), tzinfo=dt_util.DEFAULT_TIME_ZONE
+        )
+        statistics.append(
+            StatisticData(
+                start=start,
+                state=prefix[end] - prefix[position],
+                sum=prefix[end],
+            )
+        )
+        position = end
+
+    metadata = StatisticMetaData(
+        has_mean=False,
+        has_sum=True,
+        name=f"{NAME} {card_id} 累计充值",
+        source=DOMAIN,
+        statistic_id=statistic_id,
+        unit_of_measurement="¥",
+    )
+    async_add_external_statistics(hass, metadata, statistics)
+    _LOGGER.debug("卡号 %s 导入 %s 天的充值统计", card_id, len(statistics))
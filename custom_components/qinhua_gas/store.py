@@ -0,0 +1,107 @@
+"""Persistent invoice history for 西安天然气."""
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import STORAGE_KEY_INVOICES, STORAGE_SAVE_DELAY, STORAGE_VERSION
+from .estimator import ConsumptionEstimator
+from .history import HistoryIndex, InvoiceHistory
+from .http_client import XianGasClient
+from .parser import is_newer_item, parse_invoices
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class InvoiceStore:
+    """On-disk invoice history of one card, merged incrementally.
+
+    Records are kept in upstream order (newest first) and survive the
+    upstream endpoint truncating old invoices.
+    """
+
+    def __init__(self, hass: HomeAssistant, card_id: str) -> None:
+        """Initialize the store."""
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{STORAGE_KEY_INVOICES}.{card_id}"
+        )
+        self.history = InvoiceHistory()
+        self.last_ts: int | None = None
+        self.index: HistoryIndex | None = None
+        self.estimator: ConsumptionEstimator | None = None
+        self.last_success: datetime | None = None
+        self._dirty = False
+
+    async def async_load(self) -> None:
+        """Load the stored history."""
+        if (stored := await self._store.async_load()) is None:
+            return
+        # 以接口原始格式保存，加载时用同一个解析器还原
+        self.history = InvoiceHistory.from_records(
+            parse_invoices(stored.get("records", []))
+        )
+        if self.history:
+            self.last_ts = max(self.history.timestamps)
+        if last_success := stored.get("last_success"):
+            self.last_success = dt_util.parse_datetime(last_success)
+        _LOGGER.debug("已加载 %s 条本地充值记录", len(self.history))
+
+    async def async_remove(self) -> None:
+        """Delete the stored history."""
+        await self._store.async_remove()
+
+    def sync(self, client: XianGasClient, response: Any) -> InvoiceHistory | None:
+        """Merge invoices dated at or after the last known record.
+
+        Only the new items are cleaned. Records at the last known time are
+        compared by (ts, cost), so a second recharge on the same day is
+        merged while a repeat of a known one is not. Returns the merged
+        records, or None if the history did not change.
+        """
+        items = client._extract_invoice_items(response)
+        last_ts = self.last_ts
+        new_items = [item for item in items if is_newer_item(item, last_ts)]
+        if not new_items:
+            return None
+
+        cleaned = client._clean_invoice_data(new_items)
+        if cleaned and last_ts is not None and last_ts in cleaned.timestamps:
+            history = self.history
+            known = {
+                pair
+                for pair in zip(history.timestamps, history.costs)
+                if pair[0] == last_ts
+            }
+            cleaned = cleaned.without(known)
+        if not cleaned:
+            return None
+
+        self.history.prepend(cleaned)
+        self.last_ts = max(cleaned.timestamps)
+        self.index = None
+        _LOGGER.debug("合并 %s 条新充值记录", len(cleaned))
+        return cleaned
+
+    def mark_success(self) -> None:
+        """Record a successful refresh and schedule a save."""
+        self.last_success = dt_util.utcnow()
+        self._dirty = True
+        self._store.async_delay_save(self._data_to_save, STORAGE_SAVE_DELAY)
+
+    async def async_flush(self) -> None:
+        """Write a pending delayed save now, before the entry is unloaded."""
+        if self._dirty:
+            await self._store.async_save(self._data_to_save())
+
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return the data to persist."""
+        self._dirty = False
+        return {
+            "last_success": self.last_success.isoformat() if self.last_success else None,
+            "records": self.history.to_rows(),
+        }
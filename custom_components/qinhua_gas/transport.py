@@ -0,0 +1,222 @@
+"""Resilient HTTP transport for 西安天然气."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Protocol
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from .const import (
+    BREAKER_FAILURES,
+    BREAKER_RESET,
+    CONNECT_TIMEOUT,
+    MAX_RETRIES,
+    READ_TIMEOUT,
+    RETRY_BACKOFF,
+    STREAM_CHUNK_SIZE,
+    STREAM_EXECUTOR_THRESHOLD,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# 这些状态码说明上游暂时不可用，可以重试
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class TransportError(Exception):
+    """The request failed after all retries."""
+
+
+class CircuitOpenError(TransportError):
+    """The upstream host is considered down; the request was not sent."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one upstream host.
+
+    After failure_threshold failed attempts in a row the circuit opens and
+    requests fail immediately. After reset_timeout one trial request is let
+    through; its outcome closes or reopens the circuit.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = BREAKER_FAILURES,
+        reset_timeout: float = BREAKER_RESET,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Initialize a closed breaker."""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial_at: float | None = None
+
+    @property
+    def state(self) -> str:
+        """Return closed, open or half_open."""
+        if self.opened_at is None:
+            return "closed"
+        if self._clock() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_request(self) -> None:
+        """Raise CircuitOpenError unless a request may be sent now."""
+        state = self.state
+        if state == "closed":
+            return
+        now = self._clock()
+        if state == "half_open" and (
+            self._trial_at is None or now - self._trial_at >= self.reset_timeout
+        ):
+            # 半开状态只放行一个试探请求；试探请求被取消时超时后再放行下一个
+            self._trial_at = now
+            return
+        raise CircuitOpenError("upstream circuit is open")
+
+    def record_success(self) -> None:
+        """Close the circuit."""
+        self.failures = 0
+        self.opened_at = None
+        self._trial_at = None
+
+    def record_failure(self) -> None:
+        """Count a failed attempt and open the circuit at the threshold."""
+        self.failures += 1
+        if self._trial_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                _LOGGER.warning(
+                    "上游连续失败 %s 次，暂停请求 %s 秒", self.failures, self.reset_timeout
+                )
+            self.opened_at = self._clock()
+        self._trial_at = None
+
+
+class StreamParser(Protocol):
+    """Incremental body parser, see parser.InvoiceStreamParser."""
+
+    def feed(self, chunk: bytes) -> None:
+        """Decode one chunk of the body."""
+
+    def close(self) -> Any:
+        """Finish decoding and return the result."""
+
+
+_BREAKERS: dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(url: str) -> CircuitBreaker:
+    """Return the shared circuit breaker for the host of url."""
+    host = urlsplit(url).netloc
+    if (breaker := _BREAKERS.get(host)) is None:
+        breaker = _BREAKERS[host] = CircuitBreaker()
+    return breaker
+
+
+async def async_post_json(
+    session: aiohttp.ClientSession,
+    url: str,
+    data: str,
+    headers: dict[str, str] | None = None,
+    connect_timeout: float = CONNECT_TIMEOUT,
+    read_timeout: float = READ_TIMEOUT,
+    retries: int = MAX_RETRIES,
+    backoff: float = RETRY_BACKOFF,
+    breaker: CircuitBreaker | None = None,
+    parser_factory: Callable[[], StreamParser] | None = None,
+    before_attempt: Callable[[], Awaitable[None]] | None = None,
+) -> Any:
+    """POST and decode a JSON response, retrying transient failures.
+
+    Each attempt is bounded by connect_timeout + read_timeout overall.
+    Connection errors, timeouts and 429/5xx responses are retried up to
+    retries times with jittered exponential backoff. Other HTTP errors are
+    raised at once. The response is always released back to the pool.
+
+    With parser_factory the body is streamed into a fresh parser per
+    attempt instead of being buffered and decoded in one go.
+    before_attempt is awaited before every attempt, retries included, so
+    a rate limiter counts each request actually sent.
+    """
+    breaker = breaker or get_breaker(url)
+    # 每次尝试还有总时限，逐字节慢慢返回的上游也不能一直占着并发名额
+    timeout = aiohttp.ClientTimeout(
+        total=connect_timeout + read_timeout,
+        sock_connect=connect_timeout,
+        sock_read=read_timeout,
+    )
+    attempt = 0
+    while True:
+        if before_attempt is not None:
+            await before_attempt()
+        breaker.before_request()
+        try:
+            async with session.post(
+                url, data=data, headers=headers, timeout=timeout
+            ) as response:
+                if response.status in RETRY_STATUSES:
+                    raise aiohttp.ClientResponseError(
+                        response.request_info,
+                        response.history,
+                        status=response.status,
+                        message=response.reason or "",
+                    )
+                # 上游有响应就说明主机可用，4xx 不计入熔断
+                breaker.record_success()
+                response.raise_for_status()
+                if parser_factory is None:
+                    return await response.json()
+                return await _async_stream(response, parser_factory())
+        except aiohttp.ClientResponseError as err:
+            if err.status not in RETRY_STATUSES:
+                raise TransportError(f"HTTP {err.status}: {err.message}") from err
+            error: Exception = err
+        except (
+            aiohttp.ClientConnectionError,
+            aiohttp.ClientPayloadError,
+            asyncio.TimeoutError,
+        ) as err:
+            error = err
+        breaker.record_failure()
+        if attempt >= retries:
+            raise TransportError(
+                f"request failed after {attempt + 1} attempts: {type(error).__name__} {error}"
+            ) from error
+        delay = random.uniform(0, backoff * 2**attempt)
+        attempt += 1
+        _LOGGER.debug("请求失败 (%r)，%.2f 秒后第 %s 次重试", error, delay, attempt)
+        await asyncio.sleep(delay)
+
+
+async def _async_stream(
+    response: aiohttp.ClientResponse, parser: StreamParser
+) -> Any:
+    """Feed the body to parser chunk by chunk.
+
+    Large bodies are parsed in the executor so the event loop only moves
+    bytes; small ones are not worth the thread hop. A body the parser
+    rejects, at any point, raises TransportError.
+    """
+    loop = asyncio.get_running_loop()
+    received = 0
+    offload = (response.content_length or 0) > STREAM_EXECUTOR_THRESHOLD
+    try:
+        async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+            received += len(chunk)
+            if offload or received > STREAM_EXECUTOR_THRESHOLD:
+                offload = True
+                await loop.run_in_executor(None, parser.feed, chunk)
+            else:
+                parser.feed(chunk)
+        # 字符串包裹的响应体在 close() 时整体解析，大响应同样放到线程池
+        if offload:
+            return await loop.run_in_executor(None, parser.close)
+        return parser.close()
+    except ValueError as err:
+        raise TransportError(f"invalid response body: {err}") from err
@@ -0,0 +1,24 @@
+"""Export invoice history of many cards to CSV or JSON Lines, without Home Assistant.
+
+Usage: python scripts/export_invoices.py cards.csv invoices.csv [--concurrency 4]
+
+cards.csv has user_id,card_id,token_s columns (or use a .jsonl card list).
+Re-running the same command after an interruption resumes from the
+checkpoint file next to the output.
+"""
+from __future__ import annotations
+
+import importlib
+from pathlib import Path
+import sys
+import types
+
+COMPONENT_DIR = Path(__file__).resolve().parent.parent / "custom_components" / "qinhua_gas"
+PACKAGE = "qinhua_gas"
+
+if __name__ == "__main__":
+    # 包的 __init__ 依赖 Home Assistant，导出只需要客户端，按裸命名空间加载
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [str(COMPONENT_DIR)]
+    sys.modules[PACKAGE] = package
+    importlib.import_module(f"{PACKAGE}.export").main()
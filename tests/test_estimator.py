@@ -0,0 +1,88 @@
+"""Tests for the consumption estimators."""
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+
+from custom_components.qinhua_gas.estimator import ESTIMATORS, MAX_PROJECTION_DAYS
+from custom_components.qinhua_gas.history import HistoryIndex, InvoiceHistory
+from custom_components.qinhua_gas.http_client import XianGasClient
+
+BATCHES = [
+    # 同一天的第二笔充值
+    [
+        [{"dt": "2024-01-01", "fee": 300}, {"dt": "2024-03-09", "fee": 200}],
+        [{"dt": "2024-03-09", "fee": 50}],
+    ],
+    [
+        [{"dt": "2024-03-09", "fee": 50}, {"dt": "2024-01-01", "fee": 300}],
+        [{"dt": "2024-03-09", "fee": 200}],
+    ],
+    # 带时间的记录与只有日期的记录
+    [
+        [{"dt": "2023-11-01", "fee": 100}, {"dt": "2024-01-05 10:00:00", "fee": 150}],
+        [{"dt": "2024-01-05 10:00:00", "fee": 20}, {"dt": "2024-02-01", "fee": 80}],
+        [{"dt": "2024-03-01", "fee": 90}],
+    ],
+    # 比已有记录更早的补录
+    [
+        [{"dt": "2024-01-01", "fee": 100}, {"dt": "2024-02-01", "fee": 100}],
+        [{"dt": "2023-12-01", "fee": 100}, {"dt": "2024-03-01", "fee": 60}],
+    ],
+]
+
+
+def _client(key: str) -> XianGasClient:
+    """Return a client projecting for a fixed day."""
+    return XianGasClient("u", "c", 0, "t", estimator=key, clock=lambda: datetime(2024, 3, 20))
+
+
+@pytest.mark.parametrize("key", ESTIMATORS)
+@pytest.mark.parametrize("batches", BATCHES)
+def test_incremental_matches_rebuild(key: str, batches: list) -> None:
+    """Feeding new batches gives the same projection as a full rebuild."""
+    client = _client(key)
+    history = InvoiceHistory()
+    estimator = None
+    for batch in batches:
+        added = client._clean_invoice_data(batch)
+        history.prepend(added)
+        index = HistoryIndex.from_history(history)
+        # 与协调器相同：能增量合并就增量，否则从完整历史重建
+        if estimator is None or not estimator.update(
+            HistoryIndex.from_history(added).items()
+        ):
+            estimator = client._summarize_gas_usage(index)
+        rebuilt = client._summarize_gas_usage(index)
+        if rebuilt is None:
+            continue
+        assert client._project_gas_usage(estimator) == client._project_gas_usage(rebuilt)
+
+
+@pytest.mark.parametrize("key", ESTIMATORS)
+def test_update_rejects_same_time(key: str) -> None:
+    """Records at the latest time cannot be merged incrementally."""
+    estimator = ESTIMATORS[key]()
+    # 重建时同一时间的记录按 (ts, cost) 顺序依次喂入
+    assert estimator.update([(86400, 50.0), (86400, 100.0)])
+    assert not estimator.update([(86400, 20.0)])
+    assert not estimator.update([(0, 20.0)])
+    assert estimator.update([(2 * 86400, 20.0), (2 * 86400, 30.0)])
+
+
+@pytest.mark.parametrize("key", ESTIMATORS)
+@pytest.mark.parametrize("xiuzheng", [0, -1000])
+def test_projection_is_bounded(key: str, xiuzheng: float) -> None:
+    """A tiny daily spend does not project beyond MAX_PROJECTION_DAYS."""
+    client = _client(key)
+    client.xiuzheng = xiuzheng
+    history = client._clean_invoice_data(
+        [
+            {"dt": "2024-03-01", "fee": 100},
+            {"dt": "2024-02-01", "fee": 0.01},
+            {"dt": "2024-01-01", "fee": 0.01},
+        ]
+    )
+    usage_days = client._calculate_gas_usage(history)["usage_days"]
+    assert abs(usage_days) <= MAX_PROJECTION_DAYS
@@ -0,0 +1,131 @@
+"""Tests for the invoice response parser."""
+from __future__ import annotations
+
+from datetime import date
+import json
+
+import pytest
+
+from custom_components.qinhua_gas.parser import (
+    SECONDS_PER_DAY,
+    InvoiceStreamParser,
+    is_newer_item,
+    parse_cost,
+    parse_invoices,
+    parse_timestamp,
+)
+
+BODIES = [
+    {"data": [{"dt": "2024-03-01", "fee": 100}], "n": 1.5},
+    {"n": 1.5, "data": []},
+    {"code": -12.5e-3, "data": [{"dt": "2024-3-9", "fee": "12.50"}], "ok": True},
+    {"msg": "成功", "total": 120, "data": [{"dt": "2024-01-01 10:00:00", "fee": 1e2}]},
+    {"data": [{"dt": "2024-02-01", "fee": 0.5}, {"dt": "2024-01-01", "fee": -3}]},
+    [{"dt": "2024-02-01", "fee": 25}],
+]
+
+
+def _feed(body: bytes, size: int, keep=None) -> dict:
+    """Feed a body in chunks of size bytes and return the parsed result."""
+    parser = InvoiceStreamParser(keep)
+    for start in range(0, len(body), size):
+        parser.feed(body[start : start + size])
+    return parser.close()
+
+
+def _expected(document) -> dict:
+    """Return what the stream parser should produce for a document."""
+    if isinstance(document, list):
+        return {"data": document}
+    return document
+
+
+@pytest.mark.parametrize("document", BODIES)
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 64])
+def test_stream_parser_any_chunking(document, size: int) -> None:
+    """The result does not depend on where the chunks split."""
+    for separators in ((",", ":"), (", ", ": ")):
+        body = json.dumps(document, ensure_ascii=False, separators=separators)
+        assert _feed(body.encode(), size) == _expected(document)
+
+
+@pytest.mark.parametrize("size", [1, 2, 5])
+def test_stream_parser_string_body(size: int) -> None:
+    """A body that is a JSON string holding the document is unwrapped."""
+    document = BODIES[2]
+    body = json.dumps(json.dumps(document, ensure_ascii=False), ensure_ascii=False)
+    assert _feed(body.encode(), size) == document
+
+
+def test_stream_parser_keep() -> None:
+    """Only items accepted by keep are returned, but all are counted."""
+    body = json.dumps(BODIES[4]).encode()
+    parser = InvoiceStreamParser(lambda item: item["fee"] > 0)
+    for start in range(len(body)):
+        parser.feed(body[start : start + 1])
+    assert parser.close()["data"] == [{"dt": "2024-02-01", "fee": 0.5}]
+    assert parser.total == 2
+
+
+def test_stream_parser_without_data() -> None:
+    """A body without a data array has no data key."""
+    assert _feed(b'{"code": 500, "msg": "error"}', 1) == {"code": 500, "msg": "error"}
+
+
+@pytest.mark.parametrize("body", [b'{"data": [{"dt": "2024-01-01"', b'{"n": 1.', b"<html>"])
+def test_stream_parser_invalid(body: bytes) -> None:
+    """Truncated and non-JSON bodies raise ValueError."""
+    with pytest.raises(ValueError):
+        _feed(body, 1)
+
+
+def test_parse_timestamp() -> None:
+    """Padded, non-padded and timed dates parse; anything else does not."""
+    day = date(2024, 3, 9).toordinal() * SECONDS_PER_DAY
+    assert parse_timestamp("2024-03-09") == day
+    assert parse_timestamp("2024-3-9") == day
+    assert parse_timestamp("2024-03-09 10:20:30") == day + 10 * 3600 + 20 * 60 + 30
+    for value in ("2024/03/09", "2024-13-01", "", None, 20240309):
+        assert parse_timestamp(value) is None
+
+
+def test_parse_cost() -> None:
+    """Numbers and numeric strings are costs; other values are not."""
+    assert parse_cost(12) == 12.0
+    assert parse_cost(" 12.5 ") == 12.5
+    assert parse_cost("1e2") == 100.0
+    for value in ("nan", "inf", "abc", None, [1]):
+        assert parse_cost(value) is None
+
+
+def test_parse_invoices() -> None:
+    """Invalid items are skipped and invalid fees count as zero."""
+    records = parse_invoices(
+        {
+            "data": [
+                {"dt": "2024-3-9", "fee": "100"},
+                {"dt": "2024-02-01 10:00:00", "fee": "abc"},
+                {"dt": "not a date", "fee": 10},
+                {"fee": 10},
+                "item",
+            ]
+        }
+    )
+    assert [(record.date, record.cost) for record in records] == [
+        ("2024-3-9", 100.0),
+        ("2024-02-01 10:00:00", 0.0),
+    ]
+    assert records[0].ts == date(2024, 3, 9).toordinal() * SECONDS_PER_DAY
+    assert parse_invoices(json.dumps({"data": [{"dt": "2024-01-01", "fee": 1}]}))
+    assert parse_invoices("not json") == []
+
+
+def test_is_newer_item() -> None:
+    """Items are compared by parsed timestamp, at or after since."""
+    since = parse_timestamp("2024-03-09")
+    assert is_newer_item({"dt": "2024-3-9"}, since)
+    assert is_newer_item({"dt": "2024-03-09 08:00:00"}, since)
+    assert not is_newer_item({"dt": "2024-3-8"}, since)
+    assert not is_newer_item({"dt": "bad"}, since)
+    assert not is_newer_item({"fee": 1}, None)
+    assert is_newer_item({"dt": "bad"}, None)